@@ -0,0 +1,120 @@
+import random
+
+"""Handles CPU controlled fighters.
+This module contains the CPUController class, which drives a Fighter through
+the same start_action/stop_action interface the keyboard uses. Subclasses can
+override decide() to script other behaviours."""
+
+MASK_64 = (1 << 64) - 1
+
+
+class SplitMix:
+    """SplitMix64 random numbers. The whole state is one 64 bit int, so match
+    snapshots can save and restore it in a few bytes, where random.Random's
+    state is 625 ints."""
+
+    def __init__(self, seed = None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & MASK_64
+
+    def random(self):
+        """Returns a float in [0, 1)."""
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK_64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return ((z ^ (z >> 31)) >> 11) * (1.0 / (1 << 53))
+
+
+class CPUController:
+    """Class to control a fighter with a simple CPU opponent."""
+
+    def __init__(self, fighter, opponent, seed = None, aggression = 0.6, reaction_ticks = 6,
+                 opponents = None):
+        """Initializes the controller for fighter, fighting opponent. If opponents
+        is given, the nearest one still standing is fought instead."""
+        self.fighter = fighter
+        self.opponent = opponent
+        self.opponents = opponents
+        self.random = SplitMix(seed)
+        self.aggression = aggression # chance to attack when in range
+        self.reaction_ticks = reaction_ticks # ticks between decisions
+        self.held = set()
+        self.ticks = 0
+
+    def hold(self, action):
+        """Starts an action and keeps it going until released."""
+        if action not in self.held:
+            self.held.add(action)
+            self.fighter.start_action(action)
+
+    def release(self, action):
+        """Stops a held action."""
+        if action in self.held:
+            self.held.discard(action)
+            self.fighter.stop_action(action)
+
+    def release_all(self):
+        """Stops every held action."""
+        for action in list(self.held):
+            self.release(action)
+
+    def tap(self, action):
+        """Starts and stops an action, like a quick key press."""
+        self.fighter.start_action(action)
+        self.fighter.stop_action(action)
+
+    def key_down(self, key):
+        """CPU fighters ignore the keyboard."""
+        return False
+
+    def key_up(self, key):
+        return False
+
+    def update(self):
+        """Called once per tick, decides what to do every reaction_ticks."""
+        if self.ticks % self.reaction_ticks == 0:
+            if self.opponents:
+                self.pick_opponent()
+            if self.opponent is not None:
+                self.decide()
+        self.ticks += 1
+
+    def pick_opponent(self):
+        """Targets the nearest opponent still standing, preferring the ones
+        the fighter faces."""
+        x = self.fighter.rect.centerx
+        facing = 1 if self.fighter.is_player_1 else -1
+        standing = [opponent for opponent in self.opponents if opponent.hp > 0]
+        in_front = [opponent for opponent in standing
+                    if (opponent.rect.centerx - x) * facing >= 0]
+        if standing:
+            self.opponent = min(in_front or standing,
+                                key=lambda opponent: abs(opponent.rect.centerx - x))
+
+    def decide(self):
+        """Default behaviour: walk up to the opponent and attack when in range.
+        Fighters never turn around, attacks only reach right for player 1 and
+        left for player 2, so an opponent behind is walked past first."""
+        distance = self.opponent.rect.centerx - self.fighter.rect.centerx
+        facing = 1 if self.fighter.is_player_1 else -1
+        reach = self.fighter.attack_1_hitbox_width + self.opponent.rect.width / 2
+
+        if 0 <= distance * facing <= reach:
+            self.release_all()
+            if self.random.random() < self.aggression:
+                self.tap('attack1' if self.random.random() < 0.6 else 'attack2')
+            elif self.random.random() < 0.2:
+                self.tap('jump')
+            return
+
+        # Walk towards the opponent, sometimes dashing or jumping
+        direction = 'right' if distance > 0 else 'left'
+        self.release('left' if direction == 'right' else 'right')
+        if self.random.random() < 0.05:
+            # A double press dashes
+            self.release(direction)
+            self.tap(direction)
+        self.hold(direction)
+        if self.random.random() < 0.05:
+            self.tap('jump')
@@ -0,0 +1,288 @@
+import os
+
+# The benchmarks always run headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Benchmark matches aren't saved to the results store
+os.environ.setdefault('FIGHTPUNKS_RESULTS', '')
+
+import gc, json, sys, time, tracemalloc
+import pygame
+
+from main import FiGHTPuNKS
+from button import Button
+from fighters import Fighter
+from loader import MatchLoader
+
+"""Micro-benchmarks for the fighter and render hot paths.
+Runs each hot path in isolation under the SDL dummy driver and reports
+ns/op and the Python memory allocated per call (tracemalloc peak, so pixel
+buffers allocated by SDL are not counted). Results are compared against a
+stored baseline and the script exits with 1 if any case got slower than the
+threshold.
+
+Usage: python bench_hotpaths.py [case ...] [--save-baseline] [--threshold PCT]
+                                [--baseline FILE]"""
+
+BASELINE_FILE = 'bench_hotpaths_baseline.json'
+DEFAULT_THRESHOLD = 15.0 # percent
+TARGET_TIME = 0.2 # seconds per repeat
+REPEATS = 5
+
+
+def make_game():
+    """Creates a game instance with a match set up, without the menus."""
+    game = FiGHTPuNKS(show_menu=False)
+    loader = MatchLoader(game, 'kevin', 'Dredmoore')
+    loader.wait()
+    game.set_stage(loader.stage)
+    game.load_fighters('kevin', 'Dredmoore', False)
+    game.time = game.settings.round_time
+    game.start_time = game.get_ticks()
+    game.running = True
+    return game
+
+
+def reset_fighter(fighter):
+    """Puts the fighter back into the idle state in the middle of the screen."""
+    fighter.moving_right = fighter.moving_left = False
+    fighter.jumping = fighter.is_dashing = False
+    fighter.dash_right = fighter.dash_left = False
+    fighter.is_attacking_1 = fighter.is_attacking_2 = False
+    fighter.rect.midbottom = (fighter.settings.screen_width / 2, 650)
+
+
+def fighter_cases(game):
+    """Builds the Fighter.update/animate/draw cases."""
+    fighter, dummy = game.fighters
+    cases = {}
+
+    def update_idle():
+        fighter.update()
+
+    def update_walking():
+        fighter.moving_right = True
+        fighter.update()
+        fighter.rect.centerx = 600
+
+    def update_dashing():
+        fighter.is_dashing = fighter.dash_right = True
+        fighter.dash_start_time = game.get_ticks()
+        fighter.update()
+        fighter.rect.centerx = 600
+
+    def update_attacking():
+        fighter.is_attacking_1 = True
+        fighter.attack_1_start_time = game.get_ticks()
+        fighter.update()
+
+    def update_mirrored():
+        dummy.update()
+
+    def animate_same_action():
+        fighter.animate(fighter.action)
+
+    def animate_mirrored():
+        dummy.animate(dummy.action)
+
+    def animate_switch_action():
+        fighter.animate('walkr' if fighter.action == 'idle' else 'idle')
+
+    def draw_normal():
+        fighter.draw(game.screen, game.camera)
+
+    inverted = Fighter(game, 900, 650, 'Dredmoore', False, is_inverted=True)
+
+    def draw_inverted():
+        inverted.draw(game.screen, game.camera)
+
+    cases['Fighter.update idle'] = update_idle
+    cases['Fighter.update walking'] = update_walking
+    cases['Fighter.update dashing'] = update_dashing
+    cases['Fighter.update attacking'] = update_attacking
+    cases['Fighter.update mirrored'] = update_mirrored
+    cases['Fighter.animate'] = animate_same_action
+    cases['Fighter.animate mirrored'] = animate_mirrored
+    cases['Fighter.animate switch'] = animate_switch_action
+    cases['Fighter.draw'] = draw_normal
+    cases['Fighter.draw inverted'] = draw_inverted
+    return cases
+
+
+def render_cases(game):
+    """Builds the screen, HUD, button and loader cases."""
+    button = Button(None, (600, 400), 'START', game.menus.font, 'black', 'red')
+    cases = {}
+
+    def update_screen():
+        game.update_screen()
+
+    # A stage four screens wide should cost the same as a screen-sized one
+    stage = game.stage
+    wide_stage = pygame.transform.scale_by(stage, (4, 1)).convert()
+
+    def update_screen_wide():
+        game.set_stage(wide_stage)
+        game.camera.view.centerx = game.camera.world.centerx
+        game.update_screen()
+        game.set_stage(stage)
+
+    # A busy exchange: the pool kept full of sparks
+    effects = game.effects
+
+    def fill_effects():
+        while effects.count < effects.max_particles:
+            effects.spawned = 0
+            effects.hit(game.fighters[1].rect.center, game.settings.attack_2_damage)
+
+    def effects_hit():
+        effects.clear()
+        effects.hit(game.fighters[1].rect.center, game.settings.attack_2_damage)
+
+    def effects_update():
+        fill_effects()
+        effects.update()
+
+    def effects_draw():
+        fill_effects()
+        effects.draw(game.screen, game.camera)
+
+    def show_hp():
+        game.show_hp(game.fighters[0], (50, 50), True)
+
+    def timer():
+        game.timer((game.screen.width / 2, 75))
+
+    def button_update():
+        button.update(game.screen)
+
+    def load_fighters():
+        game.settings.load_fighters()
+
+    cases['FiGHTPuNKS.update_screen'] = update_screen
+    cases['FiGHTPuNKS.update_screen wide stage'] = update_screen_wide
+    cases['Effects.hit'] = effects_hit
+    cases['Effects.update full'] = effects_update
+    cases['Effects.draw full'] = effects_draw
+    cases['FiGHTPuNKS.show_hp'] = show_hp
+    cases['FiGHTPuNKS.timer'] = timer
+    cases['Button.update'] = button_update
+    cases['Settings.load_fighters'] = load_fighters
+    return cases
+
+
+def time_case(func):
+    """Returns the best time per call in nanoseconds."""
+    # Calibrate the number of loops so one repeat takes about TARGET_TIME
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= TARGET_TIME * 1e9 / 10 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * TARGET_TIME * 1e9 / max(elapsed, 1)))
+
+    best = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(REPEATS):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                func()
+            elapsed = (time.perf_counter_ns() - start) / loops
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def alloc_case(func, calls = 20):
+    """Returns the Python memory allocated per call in bytes."""
+    func() # warm up caches
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / calls
+
+
+def run(names = None):
+    """Runs the selected cases and returns {name: {'ns': .., 'bytes': ..}}."""
+    game = make_game()
+    cases = fighter_cases(game)
+    cases.update(render_cases(game))
+
+    results = {}
+    for name, func in cases.items():
+        if names and name not in names:
+            continue
+        for fighter in game.fighters:
+            reset_fighter(fighter)
+        results[name] = {'ns': round(time_case(func)), 'bytes': round(alloc_case(func))}
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Prints the results next to the baseline. Returns True on a regression."""
+    regressed = False
+    print(f"{'case':<38} {'ns/op':>12} {'B/op':>10} {'baseline':>12} {'change':>9}")
+    for name, result in results.items():
+        line = f"{name:<38} {result['ns']:>12,} {result['bytes']:>10,}"
+        if name in baseline:
+            before = baseline[name]['ns']
+            change = (result['ns'] - before) / before * 100
+            line += f' {before:>12,} {change:>+8.1f}%'
+            if change > threshold:
+                line += '  REGRESSION'
+                regressed = True
+        print(line)
+    return regressed
+
+
+def main(argv):
+    names = []
+    baseline_file = BASELINE_FILE
+    threshold = DEFAULT_THRESHOLD
+    save = False
+    args = iter(argv)
+    for arg in args:
+        if arg == '--save-baseline':
+            save = True
+        elif arg == '--baseline':
+            baseline_file = next(args)
+        elif arg == '--threshold':
+            threshold = float(next(args))
+        else:
+            names.append(arg)
+
+    results = run(names)
+
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as file:
+            baseline = json.load(file)
+    regressed = compare(baseline, results, threshold)
+
+    if save:
+        baseline.update(results)
+        with open(baseline_file, 'w') as file:
+            json.dump(baseline, file, indent=2)
+        print(f'Baseline saved to {baseline_file}')
+        return 0
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
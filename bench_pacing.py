@@ -0,0 +1,73 @@
+import os
+
+# The benchmark always runs headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Benchmark matches aren't saved to the results store
+os.environ.setdefault('FIGHTPUNKS_RESULTS', '')
+
+import sys
+
+from main import FiGHTPuNKS
+from loader import MatchLoader
+from pacer import FramePacer
+
+"""Frame pacing benchmark.
+Plays short CPU vs CPU rounds through run_game at each target frame rate,
+with and without the busy wait, and reports the pacer's stats: the frame
+rate reached, the mean and deviation of the frame times, their 99th
+percentile and the frames that came more than half a frame late.
+
+Usage: python bench_pacing.py [targets ...] [--seconds S]"""
+
+DEFAULT_TARGETS = [60, 120, 144, 0]
+
+
+def make_game():
+    """Creates a headless game with a CPU vs CPU match loaded. Returns it and the stage."""
+    game = FiGHTPuNKS(show_menu=False)
+    loader = MatchLoader(game, 'kevin', 'Dredmoore')
+    loader.wait()
+    return game, loader.stage
+
+
+def play(game, stage, target, busy_wait, seconds):
+    """Plays a round of seconds at target FPS, returns the pacer's stats."""
+    # Every round is played on the same stage
+    game.set_stage(stage)
+    game.clear_players()
+    game.add_player('kevin', seed=1)
+    game.add_player('Dredmoore', seed=2)
+    game.place_fighters()
+    game.settings.round_time = seconds * 1000 + 1000 # the timer ends rounds at 0s
+    game.pacer = FramePacer(game.settings, target, busy_wait=busy_wait, history=100000)
+    game.run_game()
+    return game.pacer.stats(), len(game.pacer.frame_times)
+
+
+def main(argv):
+    targets = []
+    seconds = 3
+    args = iter(argv)
+    for arg in args:
+        if arg == '--seconds':
+            seconds = int(next(args))
+        else:
+            targets.append(int(arg))
+
+    game, stage = make_game()
+    print(f"{'target':>8} {'busy wait':>9} {'frames':>7} {'fps':>7} {'mean ms':>8} "
+          f"{'stdev ms':>9} {'p99 ms':>7} {'late':>5}")
+    for target in targets or DEFAULT_TARGETS:
+        for busy_wait in (False, True):
+            if not target and busy_wait:
+                continue # nothing to wait for
+            stats, frames = play(game, stage, target, busy_wait, seconds)
+            print(f"{target or 'none':>8} {'yes' if busy_wait else 'no':>9} {frames:>7} "
+                  f"{stats['fps']:>7.1f} {stats['mean_ms']:>8.2f} {stats['stdev_ms']:>9.3f} "
+                  f"{stats['p99_ms']:>7.2f} {stats['late_frames']:>5}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
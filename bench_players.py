@@ -0,0 +1,80 @@
+import os
+
+# The benchmark always runs headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Benchmark matches aren't saved to the results store
+os.environ.setdefault('FIGHTPUNKS_RESULTS', '')
+
+import statistics, sys, time
+
+from main import FiGHTPuNKS
+
+"""Scaling benchmark for the player slots.
+Fills a match with more and more CPU players in a free-for-all and reports
+the time per frame spent updating them (controllers, fighters, hits and
+effects) and drawing the frame. Both should grow linearly with the number of
+fighters.
+
+Usage: python bench_players.py [counts ...] [--frames N]"""
+
+DEFAULT_COUNTS = [2, 4, 8, 16, 32, 64]
+NAMES = ['kevin', 'Dredmoore', 'Xiuhcoatl']
+
+
+def make_game():
+    """Creates a game instance with every fighter loaded, without the menus."""
+    game = FiGHTPuNKS(show_menu=False)
+    for name in NAMES:
+        game.settings.load_fighter(name)
+    game.set_stage(game.settings.load_stage(1))
+    game.time = game.settings.round_time
+    game.start_time = game.get_ticks()
+    game.running = True
+    return game
+
+
+def measure(game, count, frames):
+    """Plays frames frames with count CPU players. Returns the median update
+    and draw times in ms."""
+    game.clear_players()
+    game.effects.clear()
+    for index in range(count):
+        game.add_player(NAMES[index % len(NAMES)], seed=index)
+    game.place_fighters()
+
+    update_times, draw_times = [], []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.update_fighters()
+        if game.round_over():
+            for fighter in game.fighters:
+                fighter.hp = 100
+        middle = time.perf_counter()
+        game.update_screen()
+        end = time.perf_counter()
+        update_times.append((middle - start) * 1000)
+        draw_times.append((end - middle) * 1000)
+    return statistics.median(update_times), statistics.median(draw_times)
+
+
+def main(argv):
+    counts = []
+    frames = 600
+    args = iter(argv)
+    for arg in args:
+        if arg == '--frames':
+            frames = int(next(args))
+        else:
+            counts.append(int(arg))
+
+    game = make_game()
+    print(f"{'fighters':>8} {'update ms':>10} {'draw ms':>8} {'update us/fighter':>18}")
+    for count in counts or DEFAULT_COUNTS:
+        update, draw = measure(game, count, frames)
+        print(f"{count:>8} {update:>10.3f} {draw:>8.3f} {update * 1000 / count:>18.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
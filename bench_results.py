@@ -0,0 +1,86 @@
+import os, random, statistics, sys, tempfile, time
+
+from results import ResultsStore
+
+"""Benchmark for the match results store.
+Bulk imports many synthetic tournament results into a new database, then
+times what the game does with it: queuing a result from the game thread and
+the scoreboard's reads, next to summing the same leaderboard from every
+match, which is what the per-fighter totals save.
+
+Usage: python bench_results.py [--matches N] [--db FILE]"""
+
+NAMES = ['kevin', 'Dredmoore', 'Xiuhcoatl']
+STATS = ('score', 'attack_count', 'dash_count', 'jump_count', 'block_count', 'combo_count')
+
+
+def make_results(count, seed = 0):
+    """Returns count random one on one results."""
+    rng = random.Random(seed)
+    start = time.time() - count
+    results = []
+    for index in range(count):
+        hp = [rng.choice((0.0, rng.uniform(0, 100))) for _ in range(2)]
+        results.append({
+            'played_at': start + index, 'stage': rng.randrange(4),
+            'duration_ms': rng.randrange(3000, 99000), 'source': 'tournament',
+            'fighters': [{'name': rng.choice(NAMES), 'team': team, 'hp': hp[team],
+                          'stats': {name: rng.randrange(20) for name in STATS}}
+                         for team in range(2)],
+        })
+    return results
+
+
+def timed(function, repeat = 50):
+    """Returns the median time of function in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(argv):
+    count = 300000
+    path = None
+    args = iter(argv)
+    for arg in args:
+        if arg == '--matches':
+            count = int(next(args))
+        elif arg == '--db':
+            path = next(args)
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'results.db')
+
+    results = make_results(count)
+    store = ResultsStore(path)
+    start = time.perf_counter()
+    store.record_many(results)
+    queued = time.perf_counter() - start
+    store.flush()
+    elapsed = time.perf_counter() - start
+    print(f'Imported {count} matches in {elapsed:.2f} s ({count / elapsed:,.0f} per s), '
+          f'queuing took {queued * 1000:.0f} ms')
+
+    result = results[0]
+    print(f"{'record (game thread)':<28} {timed(lambda: store.record(result), 1000) * 1000:>10.2f} us")
+    store.flush()
+    cases = [
+        ('leaderboard', lambda: store.leaderboard()),
+        ('fighter totals', lambda: store.fighter('kevin')),
+        ('matchup totals', lambda: store.matchup('kevin', 'Dredmoore')),
+        ('fighter history', lambda: store.history('kevin')),
+        ('matchup history', lambda: store.history('kevin', 'Dredmoore')),
+        ('leaderboard from matches', lambda: store.connection.execute(
+            'SELECT fighter, count(*), sum(result = 1), sum(result = -1), sum(result = 0), '
+            'max(combo) FROM match_fighters GROUP BY fighter ORDER BY 3 DESC').fetchall()),
+    ]
+    for name, function in cases:
+        print(f'{name:<28} {timed(function):>10.3f} ms')
+    store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
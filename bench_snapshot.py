@@ -0,0 +1,73 @@
+import os
+
+# The benchmark always runs headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import sys, timeit
+import pygame
+
+from settings import Settings
+from snapshot import Snapshot
+from tournament import HeadlessMatch
+
+"""Benchmark for the match state snapshots.
+Plays a headless match part way, saves it, plays it to the end hashing every
+tick, restores the snapshot and plays the rest again, which has to give the
+same hashes. Then times save, restore and hash next to a game tick.
+
+Usage: python bench_snapshot.py [--ticks N]"""
+
+
+def per_call(function, number = 20000):
+    """Returns the time per call of function in us."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv):
+    ticks = 60
+    args = iter(argv)
+    for arg in args:
+        if arg == '--ticks':
+            ticks = int(next(args))
+
+    pygame.display.init()
+    settings = Settings()
+    for name in ('kevin', 'Dredmoore'):
+        settings.load_fighter(name)
+    match = HeadlessMatch(settings, 'kevin', 'Dredmoore', seed=1)
+    snapshot = Snapshot(match)
+
+    for _ in range(ticks):
+        match.step()
+    saved = snapshot.save()
+    first = []
+    while match.step():
+        first.append(snapshot.hash())
+    snapshot.restore(saved)
+    second = []
+    while match.step():
+        second.append(snapshot.hash())
+    if first != second:
+        print('Restored match played differently')
+        return 1
+    print(f'{len(saved)} byte snapshot at tick {ticks}, the {len(first)} ticks after it '
+          f'replayed identically')
+
+    # Time a match that is still going
+    match = HeadlessMatch(settings, 'kevin', 'Dredmoore', seed=1)
+    snapshot = Snapshot(match)
+    saved = snapshot.save()
+    def step():
+        match.step()
+        snapshot.restore(saved)
+    restore = per_call(lambda: snapshot.restore(saved))
+    cases = [('save', per_call(snapshot.save)), ('restore', restore),
+             ('hash', per_call(snapshot.hash)), ('tick', per_call(step) - restore)]
+    for name, time in cases:
+        print(f'{name:<8} {time:>7.2f} us')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,104 @@
+import os
+
+# The benchmark always runs headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Benchmark matches aren't saved to the results store
+os.environ.setdefault('FIGHTPUNKS_RESULTS', '')
+
+import statistics, subprocess, sys, time
+import pygame
+
+from main import FiGHTPuNKS
+from loader import MatchLoader
+from broadcast import Broadcaster
+
+"""Load test for the spectator broadcast.
+Plays a CPU vs CPU match on a headless host while more and more spectator
+clients (spectator.py --headless, in another process) connect over
+localhost, and reports the host's frame time for each count. The frame time
+should not grow with the number of spectators.
+
+Usage: python bench_spectators.py [counts ...] [--seconds S]"""
+
+DEFAULT_COUNTS = [0, 10, 50, 200]
+
+
+def make_host():
+    """Creates a headless host with a match set up and a broadcaster on a free port."""
+    game = FiGHTPuNKS(show_menu=False)
+    loader = MatchLoader(game, 'kevin', 'Dredmoore')
+    loader.wait()
+    game.set_stage(loader.stage)
+    # Both players are CPU controlled
+    game.add_player('kevin', seed=1)
+    game.add_player('Dredmoore', seed=2)
+    game.place_fighters()
+    game.time = game.settings.round_time
+    game.start_time = game.get_ticks()
+    game.broadcaster = Broadcaster(game, host='127.0.0.1', port=0)
+    game.broadcaster.start_match(game.fighters, game.stage_index())
+    return game
+
+
+def play(game, seconds):
+    """Plays at 60 FPS for a while, returns the time each frame took in ms."""
+    clock = pygame.time.Clock()
+    times = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        game.update_fighters()
+        if game.round_over():
+            for fighter in game.fighters:
+                fighter.hp = 100
+        game.broadcaster.publish(game.time_left())
+        game.update_screen()
+        times.append((time.perf_counter() - start) * 1000)
+        clock.tick(60)
+    return times
+
+
+def main(argv):
+    counts = []
+    seconds = 5.0
+    args = iter(argv)
+    for arg in args:
+        if arg == '--seconds':
+            seconds = float(next(args))
+        else:
+            counts.append(int(arg))
+    counts = counts or DEFAULT_COUNTS
+
+    game = make_host()
+    port = game.broadcaster.port
+    packets = game.broadcaster.tick
+    published = game.broadcaster.bytes_published
+
+    print(f"{'spectators':>10} {'connected':>10} {'median ms':>10} {'p99 ms':>8} {'max ms':>8} {'bytes/tick':>11}")
+    for count in counts:
+        clients = None
+        if count:
+            clients = subprocess.Popen([sys.executable, 'spectator.py', '127.0.0.1', str(port),
+                                        '--headless', str(count), '--seconds', str(seconds + 2)])
+            # Let every client connect before measuring
+            deadline = time.perf_counter() + 5
+            while game.broadcaster.spectators() < count and time.perf_counter() < deadline:
+                play(game, 0.1)
+
+        times = play(game, seconds)
+        connected = game.broadcaster.spectators()
+        ticks = game.broadcaster.tick - packets
+        per_tick = (game.broadcaster.bytes_published - published) / max(ticks, 1)
+        packets, published = game.broadcaster.tick, game.broadcaster.bytes_published
+        times.sort()
+        print(f"{count:>10} {connected:>10} {statistics.median(times):>10.2f} "
+              f"{times[int(len(times) * 0.99)]:>8.2f} {times[-1]:>8.2f} {per_tick:>11.1f}")
+        if clients:
+            clients.wait()
+    game.broadcaster.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,121 @@
+import json, os, statistics, subprocess, sys, tempfile, time
+
+"""Startup time benchmark.
+Launches the game several times under the SDL dummy drivers with startup
+profiling on, takes the median of every timing, and appends the result for
+the current commit to a history file so startup regressions show up across
+commits. Import times are per module self times, see startup.py.
+
+Usage: python bench_startup.py [runs] [--history FILE] [--threshold PCT]"""
+
+HISTORY_FILE = 'bench_startup_history.jsonl'
+DEFAULT_RUNS = 5
+DEFAULT_THRESHOLD = 10.0 # percent
+
+
+def run_once():
+    """Starts the game once and returns its startup report."""
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    env = dict(os.environ,
+               SDL_VIDEODRIVER='dummy',
+               SDL_AUDIODRIVER='dummy',
+               FIGHTPUNKS_STARTUP_PROFILE=path,
+               FIGHTPUNKS_STARTUP_EXIT='1')
+    try:
+        subprocess.run([sys.executable, '-c', 'import main; main.FiGHTPuNKS()'],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(path) as file:
+            return json.load(file)
+    finally:
+        os.remove(path)
+
+
+def median_report(reports):
+    """Takes the median of every timing across several reports."""
+    result = {'time_to_first_frame_ms': statistics.median(
+        report['time_to_first_frame_ms'] for report in reports)}
+    for group in ['import_ms', 'init_ms', 'assets_ms']:
+        names = {name for report in reports for name in report[group]}
+        result[group] = {name: statistics.median(report[group].get(name, 0.0) for report in reports)
+                         for name in sorted(names)}
+    return result
+
+
+def current_commit():
+    """Returns the short hash of HEAD, or 'unknown' outside git."""
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def last_entry(history_file):
+    """Returns the most recent history entry, if any."""
+    if not os.path.exists(history_file):
+        return None
+    entry = None
+    with open(history_file) as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+    return entry
+
+
+def compare(previous, current, threshold):
+    """Prints timings that got slower than the threshold. Returns True if any did."""
+    regressed = False
+    pairs = [('time_to_first_frame_ms', previous['time_to_first_frame_ms'],
+              current['time_to_first_frame_ms'])]
+    for group in ['import_ms', 'init_ms', 'assets_ms']:
+        for name, value in current[group].items():
+            if name in previous[group]:
+                pairs.append((f'{group}/{name}', previous[group][name], value))
+
+    for name, before, after in pairs:
+        # Ignore tiny timings, they are mostly noise
+        if before < 1.0:
+            continue
+        change = (after - before) / before * 100
+        if change > threshold:
+            print(f'REGRESSION {name}: {before:.1f} ms -> {after:.1f} ms (+{change:.1f}%)')
+            regressed = True
+    return regressed
+
+
+def main(argv):
+    runs = DEFAULT_RUNS
+    history_file = HISTORY_FILE
+    threshold = DEFAULT_THRESHOLD
+    args = iter(argv)
+    for arg in args:
+        if arg == '--history':
+            history_file = next(args)
+        elif arg == '--threshold':
+            threshold = float(next(args))
+        else:
+            runs = int(arg)
+
+    reports = [run_once() for _ in range(runs)]
+    result = median_report(reports)
+
+    print(f"time to first frame: {result['time_to_first_frame_ms']:.1f} ms (median of {runs})")
+    for group in ['import_ms', 'init_ms', 'assets_ms']:
+        print(f"{group}{' (self time)' if group == 'import_ms' else ''}:")
+        for name, value in sorted(result[group].items(), key=lambda item: -item[1]):
+            print(f'  {name:<30} {value:9.1f}')
+
+    previous = last_entry(history_file)
+    regressed = compare(previous, result, threshold) if previous else False
+
+    entry = dict(result, commit=current_commit(), runs=runs, date=time.strftime('%Y-%m-%d %H:%M:%S'))
+    with open(history_file, 'a') as file:
+        file.write(json.dumps(entry) + '\n')
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
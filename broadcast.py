@@ -0,0 +1,292 @@
+import asyncio, socket, struct, threading
+
+"""Handles broadcasting matches to spectators.
+This module contains the packet format and the Broadcaster class. Every tick
+the host encodes the fighters' state once, as a delta against the previous
+tick, and hands the packet to an asyncio server on its own thread, which
+writes it to every spectator. The host's work per tick is the same however
+many spectators are connected.
+
+Packets are framed by a 2 byte length. Each starts with its type and tick:
+  MATCH     the stage index, then per fighter its name and flags
+  KEYFRAME  the timer, then per fighter x, y, action, frame and HP
+  DELTA     a mask of changed globals, then per fighter a mask of the fields
+            that changed and those fields. Small moves are sent as 1 byte.
+A spectator gets MATCH and a KEYFRAME when it connects, then DELTAs. One that
+can't keep up has its deltas skipped and gets a KEYFRAME once it catches up."""
+
+# Fighter actions, sent as their index
+ACTIONS = ('idle', 'walkr', 'walkl', 'jump', 'dash', 'attack1', 'attack2', 'block', 'hit', 'death')
+ACTION_IDS = {action: index for index, action in enumerate(ACTIONS)}
+
+# Packet types
+MATCH, KEYFRAME, DELTA = 1, 2, 3
+
+LENGTH = struct.Struct('<H')
+HEADER = struct.Struct('<BI') # type, tick
+FIGHTER = struct.Struct('<hhBBH') # x, y, action, frame, hp * 10
+
+# Delta mask bits per fighter
+X_SMALL, X_FULL, Y_SMALL, Y_FULL, ACTION, FRAME, HP = (1 << bit for bit in range(7))
+# Delta mask bits for the globals
+TIMER = 1
+
+DEFAULT_PORT = 50770
+
+
+def fighter_state(fighter):
+    """Returns the (x, y, action, frame, hp) tuple sent for a fighter."""
+    return (int(fighter.rect.x), int(fighter.rect.y), ACTION_IDS.get(fighter.action, 0),
+            int(fighter.current_anim_index) % len(fighter.anim) % 256, int(fighter.hp * 10))
+
+
+def encode_match(tick, stage_index, fighters):
+    """Encodes the match setup: the stage and each fighter's name and flags."""
+    packet = bytearray(HEADER.pack(MATCH, tick))
+    packet += bytes((stage_index, len(fighters)))
+    for fighter in fighters:
+        name = fighter.name.encode()
+        packet.append(len(name))
+        packet += name
+        packet.append(fighter.is_player_1 | fighter.inverted << 1)
+    return bytes(packet)
+
+
+def encode_keyframe(tick, timer, states):
+    """Encodes the full state of every fighter."""
+    packet = bytearray(HEADER.pack(KEYFRAME, tick))
+    packet += bytes((timer, len(states)))
+    for state in states:
+        packet += FIGHTER.pack(*state)
+    return bytes(packet)
+
+
+def encode_delta(tick, timer, states, previous_timer, previous):
+    """Encodes what changed since the previous tick."""
+    packet = bytearray(HEADER.pack(DELTA, tick))
+    if timer != previous_timer:
+        packet += bytes((TIMER, timer))
+    else:
+        packet.append(0)
+
+    for (x, y, action, frame, hp), (old_x, old_y, old_action, old_frame, old_hp) in zip(states, previous):
+        mask = 0
+        fields = bytearray()
+        dx, dy = x - old_x, y - old_y
+        if dx:
+            if -128 <= dx < 128:
+                mask |= X_SMALL
+                fields += struct.pack('<b', dx)
+            else:
+                mask |= X_FULL
+                fields += struct.pack('<h', x)
+        if dy:
+            if -128 <= dy < 128:
+                mask |= Y_SMALL
+                fields += struct.pack('<b', dy)
+            else:
+                mask |= Y_FULL
+                fields += struct.pack('<h', y)
+        if action != old_action:
+            mask |= ACTION
+            fields.append(action)
+        if frame != old_frame:
+            mask |= FRAME
+            fields.append(frame)
+        if hp != old_hp:
+            mask |= HP
+            fields += struct.pack('<H', hp)
+        packet.append(mask)
+        packet += fields
+    return bytes(packet)
+
+
+class MatchState:
+    """Class to rebuild the match state from packets, used by spectators."""
+
+    def __init__(self):
+        self.tick = 0
+        self.stage_index = None
+        self.fighters = [] # (name, is_player_1, inverted)
+        self.timer = 0
+        self.states = [] # (x, y, action, frame, hp) per fighter
+        self.ready = False # a keyframe was received for this match
+
+    def apply(self, packet):
+        """Updates the state from a packet. Returns its type."""
+        kind, self.tick = HEADER.unpack_from(packet)
+        offset = HEADER.size
+
+        if kind == MATCH:
+            self.stage_index, count = packet[offset], packet[offset + 1]
+            offset += 2
+            self.fighters = []
+            for _ in range(count):
+                length = packet[offset]
+                name = packet[offset + 1:offset + 1 + length].decode()
+                flags = packet[offset + 1 + length]
+                offset += length + 2
+                self.fighters.append((name, bool(flags & 1), bool(flags & 2)))
+            self.ready = False
+
+        elif kind == KEYFRAME:
+            self.timer, count = packet[offset], packet[offset + 1]
+            offset += 2
+            self.states = [FIGHTER.unpack_from(packet, offset + i * FIGHTER.size)
+                           for i in range(count)]
+            self.ready = True
+
+        elif kind == DELTA and self.ready:
+            if packet[offset] & TIMER:
+                self.timer = packet[offset + 1]
+                offset += 1
+            offset += 1
+            states = []
+            for x, y, action, frame, hp in self.states:
+                mask = packet[offset]
+                offset += 1
+                if mask & X_SMALL:
+                    x += struct.unpack_from('<b', packet, offset)[0]
+                    offset += 1
+                elif mask & X_FULL:
+                    x = struct.unpack_from('<h', packet, offset)[0]
+                    offset += 2
+                if mask & Y_SMALL:
+                    y += struct.unpack_from('<b', packet, offset)[0]
+                    offset += 1
+                elif mask & Y_FULL:
+                    y = struct.unpack_from('<h', packet, offset)[0]
+                    offset += 2
+                if mask & ACTION:
+                    action = packet[offset]
+                    offset += 1
+                if mask & FRAME:
+                    frame = packet[offset]
+                    offset += 1
+                if mask & HP:
+                    hp = struct.unpack_from('<H', packet, offset)[0]
+                    offset += 2
+                states.append((x, y, action, frame, hp))
+            self.states = states
+        return kind
+
+
+class Broadcaster:
+    """Class to publish the match to spectators over TCP."""
+
+    def __init__(self, game_instance, host = '0.0.0.0', port = DEFAULT_PORT, max_buffer = 64 * 1024):
+        """Starts the asyncio server on its own thread."""
+        self.game = game_instance
+        self.settings = self.game.settings
+        self.host, self.port = host, port
+        self.max_buffer = max_buffer # bytes queued for a spectator before it is skipped
+
+        # Written by the game thread
+        self.tick = 0
+        self.previous = None
+        self.previous_timer = 0
+        self.bytes_published = 0
+
+        # Only used on the server thread
+        self.clients = set()
+        self.lagging = set()
+        self.match_packet = None
+        self.last = None # (tick, timer, states) of the last packet sent
+
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+
+    def _run(self):
+        """Runs the server. Runs on the server thread."""
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._client, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        self.loop.run_forever()
+
+    async def _client(self, reader, writer):
+        """Sends the match so far to a new spectator, then waits until it leaves."""
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.match_packet:
+            self._write(writer, self.match_packet)
+        if self.last:
+            self._write(writer, encode_keyframe(*self.last))
+        self.clients.add(writer)
+        try:
+            # Spectators don't send anything, this returns when they disconnect
+            await reader.read()
+        except ConnectionError:
+            pass
+        self.clients.discard(writer)
+        self.lagging.discard(writer)
+        writer.close()
+
+    def _write(self, writer, packet):
+        writer.write(LENGTH.pack(len(packet)) + packet)
+
+    def _send(self, packet, tick, timer, states):
+        """Writes a packet to every spectator. Runs on the server thread."""
+        if packet[0] == MATCH:
+            self.match_packet = packet
+            self.last = None
+            self.lagging.clear()
+        else:
+            self.last = (tick, timer, states)
+
+        keyframe = None
+        for writer in self.clients:
+            if packet[0] == MATCH:
+                # Everyone needs the match to make sense of the frames after it,
+                # and the first of those is a keyframe
+                self._write(writer, packet)
+            elif writer.transport.get_write_buffer_size() > self.max_buffer:
+                # Too far behind, skip deltas until it catches up
+                self.lagging.add(writer)
+            elif writer in self.lagging:
+                # Caught up, a keyframe replaces the deltas it missed
+                if packet[0] == DELTA:
+                    if keyframe is None:
+                        keyframe = encode_keyframe(tick, timer, states)
+                    self._write(writer, keyframe)
+                else:
+                    self._write(writer, packet)
+                self.lagging.discard(writer)
+            else:
+                self._write(writer, packet)
+
+    def publish_packet(self, packet, timer = 0, states = None):
+        """Hands a packet to the server thread."""
+        self.bytes_published += len(packet)
+        self.loop.call_soon_threadsafe(self._send, packet, self.tick, timer, states)
+
+    def start_match(self, fighters, stage_index):
+        """Announces a new match."""
+        self.fighters = fighters
+        self.previous = None
+        self.publish_packet(encode_match(self.tick, stage_index, fighters))
+
+    def publish(self, timer):
+        """Publishes the fighters' state for this tick."""
+        self.tick += 1
+        timer = max(0, min(255, timer))
+        states = [fighter_state(fighter) for fighter in self.fighters]
+        if self.previous is None or len(states) != len(self.previous):
+            packet = encode_keyframe(self.tick, timer, states)
+        else:
+            packet = encode_delta(self.tick, timer, states, self.previous_timer, self.previous)
+        self.previous = states
+        self.previous_timer = timer
+        self.publish_packet(packet, timer, states)
+
+    def spectators(self):
+        """Returns the number of connected spectators."""
+        return len(self.clients)
+
+    def close(self):
+        """Stops the server."""
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
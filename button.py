@@ -6,8 +6,12 @@ class Button:
         self.font = font
         self.base_color, self.hovering_color = base_color, hovering_color
 
+        # Both colors are rendered once, hovering only swaps them
         self.text_input = text_input
-        self.text = self.font.render(self.text_input, True, self.base_color)
+        self.base_text = self.font.render(self.text_input, True, self.base_color)
+        self.hovering_text = self.font.render(self.text_input, True, self.hovering_color)
+        self.text = self.base_text
+        self.hovering = False
 
         if self.image is None:
             self.image = self.text
@@ -18,7 +22,7 @@ class Button:
     def update(self, screen):
         self.change_color()
         self.draw(screen)
-        
+
     def draw(self, screen):
         if self.image is not None:
             screen.blit(self.image, self.rect)
@@ -30,10 +34,11 @@ class Button:
             return True
         return False
 
+    # returns True if the button needs to be redrawn
     def change_color(self):
-        if self.rect.collidepoint(pygame.mouse.get_pos()):
-            self.text = self.font.render(self.text_input, True, self.hovering_color)
-        else:
-            self.text = self.font.render(self.text_input, True, self.base_color)
-
-        
\ No newline at end of file
+        hovering = self.rect.collidepoint(pygame.mouse.get_pos())
+        if hovering == self.hovering:
+            return False
+        self.hovering = hovering
+        self.text = self.hovering_text if hovering else self.base_text
+        return True
@@ -0,0 +1,52 @@
+import pygame
+
+"""Handles the view into the stage.
+This module contains the Camera class. Stages can be wider than the window:
+the camera follows the midpoint of the fighters, and only the part of the
+stage it sees is blitted, so a wide stage costs the same per frame as a
+screen-sized one.
+
+Background layers narrower than the stage scroll slower than it, which gives
+a parallax effect. A layer as wide as the screen doesn't scroll at all."""
+
+class Camera:
+    """Class to follow the fighters over the stage."""
+
+    def __init__(self, settings):
+        """Starts with a stage the size of the screen."""
+        self.settings = settings
+        self.view = pygame.FRect(0, 0, settings.screen_width, settings.screen_height)
+        self.world = pygame.FRect(self.view)
+        self.smoothing = settings.camera_smoothing
+
+    def set_stage(self, stage):
+        """Sizes the world to the stage and centers the view on it."""
+        # The world is never smaller than the screen
+        self.world.width = max(stage.get_width(), self.view.width)
+        self.world.height = self.view.height
+        self.view.centerx = self.world.centerx
+
+    def follow(self, *fighters, steps = 1):
+        """Moves the view towards the midpoint of the fighters. steps is the
+        time passed in game ticks, so it eases the same at any frame rate."""
+        target = sum(fighter.rect.centerx for fighter in fighters) / len(fighters)
+        smoothing = self.smoothing if steps == 1 else 1 - (1 - self.smoothing) ** steps
+        self.view.centerx += (target - self.view.centerx) * smoothing
+        self.view.clamp_ip(self.world)
+
+    def is_visible(self, rect):
+        """Checks if a rect in stage coordinates is on screen."""
+        return self.view.colliderect(rect)
+
+    def to_screen(self, rect):
+        """Returns a rect moved from stage to screen coordinates."""
+        return rect.move(-self.view.x, -self.view.y)
+
+    def draw_layer(self, renderer, layer):
+        """Draws the visible part of a background layer. Layers narrower than
+        the stage scroll proportionally slower."""
+        scroll_range = self.world.width - self.view.width
+        layer_range = layer.get_width() - self.view.width
+        x = self.view.x * layer_range / scroll_range if scroll_range > 0 and layer_range > 0 else 0
+        area = (x, 0, self.view.width, min(layer.get_height(), self.view.height))
+        renderer.blit(layer, (0, 0), area=area)
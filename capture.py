@@ -0,0 +1,212 @@
+import pygame, os, queue, struct, threading, time, zlib, json
+
+"""Handles recording matches.
+This module contains the Capture class. A finished frame is copied once into
+a ring of preallocated RGB buffers, and a worker thread encodes the buffers to
+a PNG sequence or a raw rgb24 video file. The buffers are already in PNG byte
+order, so the worker compresses them row by row straight from the buffer, and
+zlib releases the GIL while it works.
+
+If every buffer is waiting for the encoder, the frame is not captured and
+counted as dropped; the game never waits for the encoder. The ring and the
+worker are only set up by the first screenshot or clip.
+
+Raw clips can be converted with the size and fps from their .json sidecar:
+ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r FPS -i clip.raw clip.mp4"""
+
+# Byte order R, G, B in memory, as PNG and rgb24 video expect
+RGB_MASKS = (0x0000FF, 0x00FF00, 0xFF0000, 0)
+
+
+def write_png(path, surface, level = 1):
+    """Writes an RGB_MASKS surface as a PNG file."""
+    width, height = surface.get_size()
+    pitch = surface.get_pitch()
+    row_bytes = width * 3
+    pixels = memoryview(surface.get_view('0'))
+    compressor = zlib.compressobj(level)
+    data = []
+    for y in range(height):
+        data.append(compressor.compress(b'\x00')) # no filter
+        data.append(compressor.compress(pixels[y * pitch:y * pitch + row_bytes]))
+    data.append(compressor.flush())
+
+    def chunk(kind, body):
+        return (struct.pack('>I', len(body)) + kind + body
+                + struct.pack('>I', zlib.crc32(kind + body)))
+
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b'IDAT', b''.join(data)))
+        file.write(chunk(b'IEND', b''))
+
+
+def write_raw(file, surface):
+    """Appends an RGB_MASKS surface to a raw rgb24 video file."""
+    pitch = surface.get_pitch()
+    row_bytes = surface.get_width() * 3
+    pixels = memoryview(surface.get_view('0'))
+    if pitch == row_bytes:
+        file.write(pixels)
+    else:
+        # Skip the padding at the end of each row
+        for y in range(surface.get_height()):
+            file.write(pixels[y * pitch:y * pitch + row_bytes])
+
+
+class Capture:
+    """Class to record screenshots and clips without slowing the game down."""
+
+    def __init__(self, settings):
+        """Initializes the capture state, nothing is allocated until it's used."""
+        self.settings = settings
+        self.ring = None
+        self.free = queue.SimpleQueue()
+        self.jobs = queue.SimpleQueue()
+        self.thread = None
+
+        self.recording = None # 'png' or 'raw' while a clip is recorded
+        self.path = None
+        self.raw_file = None
+        self.screenshot_path = None
+        self.frame = 0
+        self.captured = 0
+        self.dropped = 0
+        self.start_time = 0
+        self.last_path = None
+        self.error = None # set by the worker if writing a capture fails
+
+    def _allocate(self):
+        """Preallocates the ring of frame buffers and starts the encoder."""
+        if self.ring is not None:
+            return
+        size = (self.settings.screen_width, self.settings.screen_height)
+        self.ring = [pygame.Surface(size, 0, 24, RGB_MASKS)
+                     for _ in range(self.settings.capture_ring_size)]
+        for index in range(len(self.ring)):
+            self.free.put(index)
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def _encode(self):
+        """Runs the queued jobs on the worker thread."""
+        while True:
+            index, outputs = self.jobs.get()
+            try:
+                if index is None:
+                    outputs()
+                else:
+                    for output in outputs:
+                        output(self.ring[index])
+            except (OSError, ValueError, pygame.error) as e:
+                # Reported by the overlay, grab stops the recording
+                print(f"Capture failed: {e}")
+                self.error = str(e)
+            if index is not None:
+                self.free.put(index)
+
+    def output_path(self, name):
+        """Returns a timestamped path in the capture directory, unique even
+        for captures started in the same millisecond."""
+        os.makedirs(self.settings.capture_dir, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'-{int(now * 1000) % 1000:03d}'
+        path = base = os.path.join(self.settings.capture_dir, f'{name}-{stamp}')
+        number = 1
+        while path == self.last_path or os.path.exists(path) or os.path.exists(path + '.png'):
+            number += 1
+            path = f'{base}-{number}'
+        self.last_path = path
+        return path
+
+    def screenshot(self):
+        """Saves the next frame as a PNG."""
+        self._allocate()
+        self.error = None
+        self.screenshot_path = self.output_path('screenshot') + '.png'
+
+    def start(self, format = 'png'):
+        """Starts recording a clip as a PNG sequence or a raw video."""
+        if self.recording:
+            self.stop()
+        self._allocate()
+        self.error = None
+        self.frame = self.captured = self.dropped = 0
+        self.start_time = time.perf_counter()
+        self.path = self.output_path('clip')
+        if format == 'raw':
+            self.path += '.raw'
+            self.raw_file = open(self.path, 'wb')
+        else:
+            os.makedirs(self.path, exist_ok=True)
+        self.recording = format
+
+    def stop(self):
+        """Stops recording and reports the dropped frames."""
+        if not self.recording:
+            return
+        if self.recording == 'raw':
+            raw_file = self.raw_file
+            # The frame rate the game ran at, measured when it's uncapped
+            fps = self.settings.target_fps
+            elapsed = time.perf_counter() - self.start_time
+            if not fps and elapsed > 0:
+                fps = round(self.frame / elapsed, 2)
+            info = {'width': self.settings.screen_width, 'height': self.settings.screen_height,
+                    'pix_fmt': 'rgb24', 'fps': fps or 60, 'frames': self.captured,
+                    'dropped': self.dropped}
+            # Closed by the worker, after the frames queued before it
+            def close():
+                raw_file.close()
+                with open(raw_file.name + '.json', 'w') as file:
+                    json.dump(info, file, indent=2)
+            self.jobs.put((None, close))
+            self.raw_file = None
+        print(f'Recorded {self.captured} frames to {self.path}, dropped {self.dropped}')
+        self.recording = None
+
+    def toggle(self):
+        """Starts or stops recording a clip."""
+        if self.recording:
+            self.stop()
+        else:
+            self.start(self.settings.capture_format or 'png')
+
+    def grab(self, renderer):
+        """Copies the finished frame into the ring if anything is being captured."""
+        if self.error and self.recording:
+            self.stop()
+        if not self.recording and not self.screenshot_path:
+            return
+        self.frame += 1
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            # The encoder is behind, drop this capture frame
+            self.dropped += 1
+            return
+        renderer.read_pixels(self.ring[index])
+
+        # Everything to do with this frame, run by the worker
+        level = self.settings.capture_png_level
+        outputs = []
+        if self.screenshot_path:
+            outputs.append(lambda surface, path=self.screenshot_path: write_png(path, surface, level))
+            self.screenshot_path = None
+        if self.recording == 'raw':
+            outputs.append(lambda surface, file=self.raw_file: write_raw(file, surface))
+        elif self.recording:
+            path = os.path.join(self.path, f'frame_{self.frame:06d}.png')
+            outputs.append(lambda surface: write_png(path, surface, level))
+        if self.recording:
+            self.captured += 1
+        self.jobs.put((index, outputs))
+
+    def overlay_text(self):
+        """Returns the capture line shown by the debug overlay, empty if idle."""
+        if self.error:
+            return f'CAPTURE FAILED: {self.error}'
+        if not self.recording:
+            return ''
+        return f'REC {self.captured} frames, {self.dropped} dropped'
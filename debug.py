@@ -1,10 +1,13 @@
 import pygame
+from startup import profiler
 
 class PgDebug:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, renderer = None):
+        with profiler.section('init', 'pygame.init (debug)'):
+            pygame.init()
         self.debugging = False
-        self.display = pygame.display.get_surface()
+        # Draws through the game's renderer when given one
+        self.display = renderer if renderer else pygame.display.get_surface()
         self.font = pygame.font.Font(None, 30)
         
     def debug(self, info, y = 10, x = 10):
@@ -0,0 +1,119 @@
+import pygame, math, random
+from array import array
+from itertools import islice
+
+"""Handles hit effects.
+This module contains the Effects class, a particle system for hit sparks.
+Particles live in preallocated arrays instead of one Sprite per spark: the
+live ones are kept packed at the front, and a dead one is replaced by the
+last live one. A spark's position follows from where and when it spawned, so
+a frame's update only has to find the dead ones, which array.index does in C.
+The spark frames are rendered once, and every particle has a preallocated
+destination and (frame, destination) pair per frame, so drawing the batch
+doesn't allocate either."""
+
+class Effects:
+    """Class to spawn, move and draw the hit sparks."""
+
+    def __init__(self, settings, seed = None):
+        """Preallocates the particle pool and renders the spark frames."""
+        self.settings = settings
+        self.max_particles = settings.effects_max_particles
+        self.max_spawn = settings.effects_max_spawn # per frame
+        self.random = random.Random(seed)
+
+        # One slot per particle, the first self.count are alive
+        size = self.max_particles
+        self.x = array('f', bytes(4 * size)) # where it spawned
+        self.y = array('f', bytes(4 * size))
+        self.vx = array('f', bytes(4 * size)) # initial velocity
+        self.vy = array('f', bytes(4 * size))
+        self.born = array('I', bytes(4 * size)) # frame it spawned on
+        self.death = array('I', bytes(4 * size)) # frame it dies on
+        self.now = 0 # frames updated so far
+        self.count = 0
+        self.spawned = 0 # this frame
+        self.dropped = 0 # sparks that didn't fit under the caps
+
+        self.frames = self.render_frames(settings.effects_frames)
+        self.offsets = [frame.get_width() / 2 for frame in self.frames]
+        # Screen position of each particle, moved in place when drawn, and
+        # its (frame, position) pair for every spark frame
+        self.dests = [[0.0, 0.0] for _ in range(size)]
+        self.pairs = [[(frame, dest) for frame in self.frames] for dest in self.dests]
+        self.batch = [None] * size
+
+    def render_frames(self, count):
+        """Renders the spark from hot and big to cold and small."""
+        frames = []
+        for i in range(count):
+            t = i / max(count - 1, 1)
+            radius = max(1, round(6 * (1 - t) + 1))
+            color = (255, int(240 - 140 * t), int(200 * (1 - t)), int(255 * (1 - t * 0.7)))
+            frame = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(frame, color, (radius, radius), radius)
+            frames.append(frame)
+        return frames
+
+    def hit(self, pos, damage):
+        """Spawns a burst of sparks at pos, bigger for stronger attacks."""
+        amount = int(damage * self.settings.effects_sparks_per_damage)
+        x, y = pos
+        for _ in range(amount):
+            if self.spawned >= self.max_spawn or self.count >= self.max_particles:
+                self.dropped += 1
+                continue
+            angle = self.random.uniform(0, 2 * math.pi)
+            speed = self.random.uniform(2, 9)
+            i = self.count
+            self.x[i] = x
+            self.y[i] = y
+            self.vx[i] = math.cos(angle) * speed
+            self.vy[i] = math.sin(angle) * speed - 3
+            self.born[i] = self.now
+            self.death[i] = self.now + self.random.randint(12, 24)
+            self.count += 1
+            self.spawned += 1
+
+    def update(self):
+        """Moves the sparks one frame and frees the dead ones."""
+        self.now += 1
+        now, count = self.now, self.count
+        x, y, vx, vy, born, death = self.x, self.y, self.vx, self.vy, self.born, self.death
+        while count:
+            try:
+                i = death.index(now, 0, count)
+            except ValueError:
+                break
+            # Move the last live particle into the free slot
+            count -= 1
+            x[i], y[i], vx[i], vy[i] = x[count], y[count], vx[count], vy[count]
+            born[i], death[i] = born[count], death[count]
+        self.count = count
+        self.spawned = 0
+
+    def draw(self, renderer, camera):
+        """Draws every spark in one batch, the renderer clips the ones out of view."""
+        count = self.count
+        if not count:
+            return
+        batch, pairs, dests, offsets = self.batch, self.pairs, self.dests, self.offsets
+        last_frame = len(self.frames) - 1
+        half_gravity = self.settings.effects_gravity / 2
+        left, top, now = camera.view.x, camera.view.y, self.now
+        for i, x, y, vx, vy, born, death in zip(range(count), self.x, self.y, self.vx,
+                                                 self.vy, self.born, self.death):
+            # Each update adds the velocity, then gravity to it
+            age = now - born
+            frame = age * last_frame // (death - born)
+            offset = offsets[frame]
+            dest = dests[i]
+            dest[0] = x + vx * age - left - offset
+            dest[1] = y + (vy + half_gravity * (age - 1)) * age - top - offset
+            batch[i] = pairs[i][frame]
+        renderer.blits(islice(batch, count))
+
+    def clear(self):
+        """Removes every spark."""
+        self.count = 0
+        self.spawned = 0
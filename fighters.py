@@ -1,5 +1,5 @@
-import pygame, random
-from settings import Settings
+import pygame
+from game_stats import GameStats
 
 
 """I will organize out-of-game attributes here.
@@ -13,7 +13,7 @@ class Fighter(pygame.sprite.Sprite):
         super().__init__()
         self.game = game_instance
         self.settings = self.game.settings # Calls Settings
-        self.screen = pygame.display.get_surface()
+        self.screen = self.game.screen
         self.name = fighter
         self.inverted = is_inverted
         self.hp = 100
@@ -25,13 +25,21 @@ class Fighter(pygame.sprite.Sprite):
         self.action = 'idle'
         self.current_anim_index = 0
         self.is_player_1 = is_player_1
-        self.anim = self.settings.fighters[fighter]['idle']
+        self.team = 0 if is_player_1 else 1 # fighters on the same team can't hit each other
+        # Player 2 faces left. Renderers that can flip while drawing get the
+        # plain frames, otherwise they are mirrored up front.
+        self.draw_flipped = not is_player_1 and self.game.renderer.can_flip
+        flipped = not is_player_1 and not self.draw_flipped
+        self.frames = self.settings.fighter_frames(fighter, flipped, is_inverted)
+        self.anim = self.frames['idle']
         self.index_count = len(self.anim)
         self.anim_speed = .2
 
         # Load both Kevin and his rect
         self.image = self.anim[0]
         self.rect = self.image.get_frect(midbottom = (x, y))
+        self.previous_pos = self.rect.topleft # at the last tick, to interpolate frames
+        self.stats = GameStats() # counted for the match results
 
          # Kevin's attack hitboxes
         #self.attack_hitbox = pygame.Rect((self.rect.centerx, self.rect.y,
@@ -41,6 +49,7 @@ class Fighter(pygame.sprite.Sprite):
         self.moving_right = False
         self.moving_left = False
         self.jumping = False
+        self.vel_y = self.settings.fighter_jump # upwards, each fighter jumps on its own
         self.dash_right = False
         self.dash_left = False
         self.blocking = False
@@ -55,10 +64,11 @@ class Fighter(pygame.sprite.Sprite):
 
         self.attack_1_hitbox_width = 125 #customize to your own liking
         self.attack_1_hitbox_height = 320 #customize to your own liking
-        self.attack_1_hitbox_offset_x_right = self.rect.x - 50 #customize to your own liking
-        self.attack_1_hitbox_offset_x_left = -self.attack_1_hitbox_width + 5 #customize to your own liking
+        self.attack_1_hitbox_offset_x_right = self.rect.width / 2 #customize to your own liking
+        self.attack_1_hitbox_offset_x_left = self.rect.width / 2 - self.attack_1_hitbox_width #customize to your own liking
         self.attack_1_hitbox_offset_y = 0
         self.attack_1_hitbox_rect = pygame.Rect(0, 0, 0, 0)
+        self.attack_1_landed = False # an attack only hits once
 
         # Attack 2 hitbox properties
         self.attack_2_start_time = 0
@@ -66,14 +76,18 @@ class Fighter(pygame.sprite.Sprite):
 
         self.attack_2_hitbox_width = 125 #customize to your own liking
         self.attack_2_hitbox_height = 320 #customize to your own liking
-        self.attack_2_hitbox_offset_x_right = self.rect.x - 50 #customize to your own liking
-        self.attack_2_hitbox_offset_x_left = -self.attack_2_hitbox_width + 5 #customize to your own liking
+        self.attack_2_hitbox_offset_x_right = self.rect.width / 2 #customize to your own liking
+        self.attack_2_hitbox_offset_x_left = self.rect.width / 2 - self.attack_2_hitbox_width #customize to your own liking
         self.attack_2_hitbox_offset_y = 0
         self.attack_2_hitbox_rect = pygame.Rect(0, 0, 0, 0)
+        self.attack_2_landed = False # an attack only hits once
+        self.hit_point = (0, 0) # where the last attack landed, for the hit effects
 
         # Dash variables
-        self.last_press_time = 0
         self.double_press_window = 200 # milliseconds
+        # Long enough ago that the first press never counts as a double press
+        self.no_press_time = -self.double_press_window - 1
+        self.last_press_time = self.no_press_time
 
         # Dash state
         self.is_dashing = False #Dash state indicator
@@ -86,6 +100,7 @@ class Fighter(pygame.sprite.Sprite):
 
     def update(self):
         """Updates Kevin based on movement flag"""
+        self.previous_pos = self.rect.topleft
         # Movement
         action = 'idle'
         
@@ -99,17 +114,17 @@ class Fighter(pygame.sprite.Sprite):
         # Jumping
         if self.jumping:
             action = 'jump'
-            self.rect.y -= self.settings.fighter_vel_y
-            self.settings.fighter_vel_y -= self.settings.fighter_gravity
+            self.rect.y -= self.vel_y
+            self.vel_y -= self.settings.fighter_gravity
 
-            if self.settings.fighter_vel_y < -self.settings.fighter_jump:
+            if self.vel_y < -self.settings.fighter_jump:
                 self.jumping = False
-                self.settings.fighter_vel_y = self.settings.fighter_jump
+                self.vel_y = self.settings.fighter_jump
 
         # Dashing
         if self.is_dashing:
             action = 'dash'
-            current_time = pygame.time.get_ticks()
+            current_time = self.game.get_ticks()
             if current_time - self.dash_start_time < self.dash_duration:
                 # Apply dash movement
                 if self.dash_right:
@@ -125,9 +140,13 @@ class Fighter(pygame.sprite.Sprite):
         # attack states
         if self.is_attacking_1:
             action = 'attack1'
-            current_time = pygame.time.get_ticks()
+            current_time = self.game.get_ticks()
             if current_time - self.attack_1_start_time < self.attack_1_duration:
-                hitbox_x = self.rect.x + self.attack_1_hitbox_offset_x_right
+                # Player 1 faces right, player 2 faces left
+                if self.is_player_1:
+                    hitbox_x = self.rect.x + self.attack_1_hitbox_offset_x_right
+                else:
+                    hitbox_x = self.rect.x + self.attack_1_hitbox_offset_x_left
                 
                 hitbox_y = self.rect.y + self.attack_1_hitbox_offset_y
                 self.attack_1_hitbox_rect.topleft = (hitbox_x, hitbox_y)
@@ -141,9 +160,13 @@ class Fighter(pygame.sprite.Sprite):
         # === Handle Attack 2 state and hitbox ===
         if self.is_attacking_2:
             action = 'attack2'
-            current_time = pygame.time.get_ticks()
+            current_time = self.game.get_ticks()
             if current_time - self.attack_2_start_time < self.attack_2_duration:
-                hitbox_x = self.rect.x + self.attack_2_hitbox_offset_x_right
+                # Player 1 faces right, player 2 faces left
+                if self.is_player_1:
+                    hitbox_x = self.rect.x + self.attack_2_hitbox_offset_x_right
+                else:
+                    hitbox_x = self.rect.x + self.attack_2_hitbox_offset_x_left
                 
                 hitbox_y = self.rect.y + self.attack_2_hitbox_offset_y
                 self.attack_2_hitbox_rect.topleft = (hitbox_x, hitbox_y)
@@ -154,11 +177,12 @@ class Fighter(pygame.sprite.Sprite):
                 self.is_attacking_2 = False
                 self.attack_2_hitbox_rect.size = (0, 0) # Hide hitbox
               
-        # Sets Kevin's range
-        if self.rect.left < 0:
-            self.rect.left = 0
-        if self.rect.right > self.settings.screen_width:
-            self.rect.right = self.settings.screen_width
+        # Sets Kevin's range, the whole stage even if it's wider than the screen
+        world = self.game.camera.world
+        if self.rect.left < world.left:
+            self.rect.left = world.left
+        if self.rect.right > world.right:
+            self.rect.right = world.right
         
         # falling
         if self.rect.bottom < 650:
@@ -167,62 +191,142 @@ class Fighter(pygame.sprite.Sprite):
             self.rect.bottom = 650
         
         self.animate(action)
-        # self.hp -= random.uniform(0,1)
 
 
+    def start_action(self, action):
+        """Starts an action: 'right', 'left', 'jump', 'attack1' or 'attack2'.
+        Keyboard and CPU controllers both drive the fighter through this."""
+        if action == 'right' or action == 'left':
+            if action == 'right':
+                self.moving_right = True
+            else:
+                self.moving_left = True
+            # Dash controls
+            current_time = self.game.get_ticks()
+            if current_time - self.last_press_time <= self.double_press_window:
+                if not self.is_dashing:
+                    self.dash_right = action == 'right'
+                    self.dash_left = action == 'left'
+                    self.is_dashing = True
+                    self.dash_start_time = current_time
+                    self.stats.dash_count += 1
+                self.last_press_time = self.no_press_time
+                
+            self.last_press_time = current_time
+
+        elif action == 'jump':
+            if not self.jumping:
+                self.stats.jump_count += 1
+            self.jumping = True
+
+        elif action == 'attack1':
+            if not self.is_attacking_1:
+                self.attack_1 = True
+                self.is_attacking_1 = True
+                self.attack_1_landed = False
+                self.attack_1_start_time = self.game.get_ticks()
+                self.stats.attack_count += 1
+
+        elif action == 'attack2':
+            if not self.is_attacking_2:
+                self.attack_2 = True
+                self.is_attacking_2 = True
+                self.attack_2_landed = False
+                self.attack_2_start_time = self.game.get_ticks()
+                self.stats.attack_count += 1
+
+    def stop_action(self, action):
+        """Stops an action started with start_action."""
+        if action == 'right':
+            self.moving_right = False
+        elif action == 'left':
+            self.moving_left = False
+        elif action == 'attack1':
+            self.attack_1 = False
+        elif action == 'attack2':
+            self.attack_2 = False
+
+    def check_hit(self, target):
+        """Damages the target if an active attack hitbox touches it. Returns the
+        damage dealt, hit_point is set to where it landed."""
+        damage = 0
+        if (self.is_attacking_1 and not self.attack_1_landed and self.attack_1_hitbox_rect.width > 0
+                and self.attack_1_hitbox_rect.colliderect(target.rect)):
+            self.attack_1_landed = True
+            self.hit_point = self.attack_1_hitbox_rect.clip(target.rect).center
+            damage += self.settings.attack_1_damage
+        if (self.is_attacking_2 and not self.attack_2_landed and self.attack_2_hitbox_rect.width > 0
+                and self.attack_2_hitbox_rect.colliderect(target.rect)):
+            self.attack_2_landed = True
+            self.hit_point = self.attack_2_hitbox_rect.clip(target.rect).center
+            damage += self.settings.attack_2_damage
+        if damage:
+            damage = min(damage, target.hp)
+            target.hp -= damage
+            self.stats.landed_hit(damage)
+            target.stats.took_hit()
+        return damage
+
     def menu_update(self, mouse_pos, animation_speed_scale, selected):
         """Update method used when using it in the character select"""
-        # Animates the idle animation
+        self.menu_animate(animation_speed_scale)
+        self.menu_draw(mouse_pos, selected)
+
+    def menu_animate(self, animation_speed_scale):
+        """Animates the idle animation, returns True if the frame changed"""
+        image = self.image
         self.animate('idle', animation_speed_scale)
-        
+        return self.image is not image
+
+    def menu_draw(self, mouse_pos, selected):
+        """Draws the fighter, bigger when hovered or selected"""
         image = self.image
         
         # Detects if the cursor is hovering on it
         if self.rect.collidepoint(mouse_pos) or selected == self.name:
             image = pygame.transform.rotozoom(self.image, 0, 1.2)
             
-        self.screen.blit(image, self.rect)
+        self.screen.blit(image, self.rect, self.draw_flipped)
 
     def on_click(self, mouse_pos):
         """For when the fighter is clicked on the menu"""
         if self.rect.collidepoint(mouse_pos):
             return self.name
         
-    def draw(self, surface):
-        """Draws Kevin into the screen"""
-        # pygame.draw.rect(surface, (255, 0, 0), self.rect)
+    def draw(self, renderer, camera, alpha = 1.0):
+        """Draws Kevin into the screen, skipping what the camera can't see.
+        alpha is how far the frame is between the last tick and the next one."""
+        # renderer.draw_rect((255, 0, 0), self.rect)
 
         # Draw Attack 1 hitbox (for debugging)
-        if self.is_attacking_1 and self.attack_1_hitbox_rect.width > 0:
-            pygame.draw.rect(surface, (255, 0, 0), self.attack_1_hitbox_rect, 2) # Red outline
+        if (self.is_attacking_1 and self.attack_1_hitbox_rect.width > 0
+                and camera.is_visible(self.attack_1_hitbox_rect)):
+            renderer.draw_rect((255, 0, 0), camera.to_screen(self.attack_1_hitbox_rect), 2) # Red outline
 
         # Draw Attack 2 hitbox (for debugging)
-        if self.is_attacking_2 and self.attack_2_hitbox_rect.width > 0:
-            pygame.draw.rect(surface, (0, 255, 0), self.attack_2_hitbox_rect, 2) # Green outline for attack 2
+        if (self.is_attacking_2 and self.attack_2_hitbox_rect.width > 0
+                and camera.is_visible(self.attack_2_hitbox_rect)):
+            renderer.draw_rect((0, 255, 0), camera.to_screen(self.attack_2_hitbox_rect), 2) # Green outline for attack 2
 
-        # draw the frame
-        if self.inverted:
-            self.image = pygame.transform.invert(self.image)
-        self.screen.blit(self.image, self.rect)
+        # draw the frame, between the last two positions at high frame rates
+        rect = self.rect
+        if alpha < 1:
+            x, y = self.previous_pos
+            rect = rect.move((x - rect.x) * (1 - alpha), (y - rect.y) * (1 - alpha))
+        if camera.is_visible(rect):
+            renderer.blit(self.image, camera.to_screen(rect), self.draw_flipped)
         
     def animate(self, action, animation_speed_scale = 1):
         """ sprite animation """
         # Continue animation if action is still the same
         if action == self.action:
             self.current_anim_index += self.anim_speed * animation_speed_scale
-            self.image = self.anim[int(self.current_anim_index) % self.index_count]
-            if not self.is_player_1:
-                self.image = pygame.transform.flip(self.image, True, False)
+            # len() rather than index_count, hot reload can add or remove frames
+            self.image = self.anim[int(self.current_anim_index) % len(self.anim)]
         # Reset animation value and replace action
         else:
             self.action = action
-            self.anim = self.settings.fighters[self.name][action]
+            self.anim = self.frames[action]
             self.current_anim_index = 0
-            self.index_count = len(self.settings.fighters[self.name][action])
-            self.image = self.anim[int(self.current_anim_index) % self.index_count]
-            if not self.is_player_1:
-                self.image = pygame.transform.flip(self.image, True, False)
-        self.current_anim_index += self.anim_speed * animation_speed_scale
-        self.image = self.idle[int(self.current_index) % self.index_count]
-        if not self.is_player_1:
-            self.image = pygame.transform.flip(self.image, True, False)
\ No newline at end of file
+            self.index_count = len(self.anim)
+            self.image = self.anim[int(self.current_anim_index) % self.index_count]
\ No newline at end of file
@@ -21,7 +21,24 @@ class GameStats:
         self.dash_count = 0
         self.jump_count = 0
         self.block_count = 0
+        self.current_combo = 0 # hits landed since last being hit
 
     def update_score(self, points):
         """Update the score by adding points."""
-        self.score += points
\ No newline at end of file
+        self.score += points
+
+    def landed_hit(self, damage):
+        """Scores a hit, combo_count keeps the longest run of hits."""
+        self.update_score(damage)
+        self.current_combo += 1
+        self.combo_count = max(self.combo_count, self.current_combo)
+
+    def took_hit(self):
+        """Ends the current combo."""
+        self.current_combo = 0
+
+    def counters(self):
+        """Returns the counters saved with the match results."""
+        return {'score': self.score, 'attack_count': self.attack_count,
+                'dash_count': self.dash_count, 'jump_count': self.jump_count,
+                'block_count': self.block_count, 'combo_count': self.combo_count}
\ No newline at end of file
@@ -0,0 +1,136 @@
+import pygame, os, queue, threading
+
+"""Handles reloading assets while the game runs.
+This module contains the AssetWatcher class. A worker thread scans the asset
+tree for changed files, and poll() applies the changes on the main thread:
+only the changed fighter frames (and the same frames of their mirrored and
+inverted variants), stages and sounds that are already loaded are decoded
+again. Assets that aren't loaded are left alone, they are read from disk when
+next needed anyway. A removed stage keeps its loaded copy, if it has one, and
+matches stop picking it once that is freed.
+
+Enabled with Settings.hot_reload."""
+
+class AssetWatcher:
+    """Class to watch the asset tree and reload what changes."""
+
+    def __init__(self, game_instance, root = 'assets'):
+        """Takes a first snapshot of the asset tree and starts watching it."""
+        self.game = game_instance
+        self.settings = self.game.settings
+        self.sounds = self.game.sounds
+        self.root = root
+        self.interval = self.settings.hot_reload_interval
+        self.changes = queue.SimpleQueue() # (added, modified, removed) paths per scan
+        self.reloaded = 0
+
+        self.files = self.scan()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+        self.thread.start()
+
+    def scan(self):
+        """Returns the modification time and size of every asset file."""
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue # removed while scanning
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _watch(self):
+        """Scans the asset tree every interval. Runs on a worker thread."""
+        while not self.stopping.wait(self.interval):
+            files = self.scan()
+            added = [path for path in files if path not in self.files]
+            modified = [path for path, stat in files.items()
+                        if path in self.files and self.files[path] != stat]
+            removed = [path for path in self.files if path not in files]
+            self.files = files
+            if added or modified or removed:
+                self.changes.put((added, modified, removed))
+
+    def stop(self):
+        """Stops watching."""
+        self.stopping.set()
+
+    def poll(self):
+        """Applies the changes found since the last call. Called every frame, it
+        does nothing but check a queue while no asset changes."""
+        while not self.changes.empty():
+            added, modified, removed = self.changes.get_nowait()
+            self.apply(added, modified, removed)
+
+    def apply(self, added, modified, removed):
+        """Reloads the loaded assets affected by the changed files."""
+        resized = set() # (fighter, action) that gained or lost frames
+        for path in added + removed:
+            parts = self.parts(path)
+            if parts[:2] == ['images', 'fighters'] and len(parts) == 5:
+                resized.add((parts[2], parts[3]))
+            elif parts[:2] == ['images', 'stages'] and path in added:
+                if path not in self.settings.stage_paths:
+                    self.settings.add_stage(path)
+                    print(f'Added stage {path}')
+            elif parts[:2] == ['images', 'stages'] and path in self.settings.stage_paths:
+                index = self.settings.stage_paths.index(path)
+                if self.settings.stages[index] is not None:
+                    print(f'Removed stage {path}, keeping it while it is loaded')
+                else:
+                    print(f'Removed stage {path}, matches no longer pick it')
+
+        for path in modified:
+            # Removed since the scan, the next scan reports it
+            if not os.path.exists(path):
+                continue
+            parts = self.parts(path)
+            try:
+                if parts[:2] == ['images', 'fighters'] and len(parts) == 5:
+                    name, action, filename = parts[2:]
+                    if (name, action) in resized:
+                        continue
+                    if self.settings.reload_fighter_frame(name, action, filename):
+                        self.reloaded += 1
+                        print(f'Reloaded {path}')
+                    else:
+                        # The frames on disk no longer match, reload them all
+                        resized.add((name, action))
+                elif parts[:2] == ['images', 'stages']:
+                    self.reload_stage(path)
+                elif parts[0] == 'audio':
+                    if self.sounds.reload(path):
+                        self.reloaded += 1
+                        print(f'Reloaded {path}')
+            except (pygame.error, OSError, ValueError) as e:
+                # Usually a file still being written, the next change retries it
+                print(f"Error reloading '{path}': {e}")
+
+        for name, action in resized:
+            try:
+                if self.settings.reload_fighter_action(name, action):
+                    self.reloaded += 1
+                    print(f'Reloaded {name} {action}')
+            except (pygame.error, OSError) as e:
+                print(f"Error reloading {name} {action}: {e}")
+
+    def parts(self, path):
+        """Splits a path into its parts below the asset root."""
+        return os.path.relpath(path, self.root).split(os.sep)
+
+    def reload_stage(self, path):
+        """Reloads a stage if it is loaded, and shows it if it's the match stage."""
+        if path not in self.settings.stage_paths:
+            return
+        index = self.settings.stage_paths.index(path)
+        old_stage = self.settings.stages[index]
+        stage = self.settings.reload_stage(index)
+        if stage is None:
+            return
+        if self.game.stage is old_stage:
+            self.game.set_stage(stage)
+        self.reloaded += 1
+        print(f'Reloaded {path}')
@@ -0,0 +1,101 @@
+import pygame, threading, time
+
+"""Handles loading match assets.
+This module contains the MatchLoader class, which loads everything a match
+needs (both fighters' frames and their mirrored/inverted variants, the stage
+and the stage music) on a worker thread, so the menus keep rendering while
+it works. Once loaded, free_memory frees older assets if the memory budget
+is exceeded. It runs on the main thread, as the menus use those assets."""
+
+# Only one loader works at a time, a replaced loader stops at its next step
+_load_lock = threading.Lock()
+
+class MatchLoader:
+    """Class to load the assets of a match in the background."""
+
+    def __init__(self, game_instance, name1, name2):
+        """Starts loading the match between name1 and name2."""
+        self.game = game_instance
+        self.settings = self.game.settings
+        self.sounds = self.game.sounds
+        self.name1 = name1
+        self.name2 = name2
+        self.invert = name1 == name2 # same fighter twice, player 2 gets inverted colors
+
+        # Loading state, read by the loading screen
+        self.progress = 0.0
+        self.status = 'LOADING'
+        self.error = None
+        self.load_time = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+        # Loaded assets
+        self.stage = None
+        self.stage_index = None
+        self.stage_music = None
+
+        self.thread = threading.Thread(target=self._load, daemon=True)
+        self.thread.start()
+
+    def matches(self, name1, name2):
+        """Checks if this loader is loading the given matchup."""
+        return (self.name1, self.name2) == (name1, name2)
+
+    def cancel(self):
+        """Stops loading after the current step."""
+        self.cancelled = True
+
+    def wait(self, timeout = None):
+        """Blocks until loading ends. Returns True if it ended."""
+        return self.done.wait(timeout)
+
+    def _load(self):
+        """Loads the match step by step. Runs on a worker thread."""
+        start = time.perf_counter()
+        steps = [
+            (f'LOADING {self.name1.upper()}', lambda: self._load_fighter(self.name1, False, False)),
+            (f'LOADING {self.name2.upper()}',
+             lambda: self._load_fighter(self.name2, not self.game.renderer.can_flip, self.invert)),
+            ('LOADING STAGE', self._load_stage),
+            ('LOADING MUSIC', self._load_music),
+        ]
+
+        with _load_lock:
+            try:
+                for i, (status, step) in enumerate(steps):
+                    if self.cancelled:
+                        break
+                    self.status = status
+                    step()
+                    self.progress = (i + 1) / len(steps)
+            except (pygame.error, OSError) as e:
+                print(f"Error loading match: {e}")
+                self.error = e
+            finally:
+                self.load_time = time.perf_counter() - start
+                self.done.set()
+
+    def _load_fighter(self, name, flipped, inverted):
+        """Loads all of a fighter's animations and the variant it will use."""
+        self.settings.load_fighter(name)
+        self.settings.fighter_frames(name, flipped, inverted)
+
+    def _load_stage(self):
+        """Picks a stage and converts it to the display format."""
+        self.stage_index = self.settings.pick_stage()
+        self.stage = self.settings.load_stage(self.stage_index)
+
+    def _load_music(self):
+        """Picks the stage music and waits for it to be decoded."""
+        stage = self.sounds.prepare_stage_music()
+        self.stage_music = stage
+        self.sounds.music.wait(self.sounds.stage_music[stage])
+
+    def free_memory(self):
+        """Frees assets other matches used if the memory budget is exceeded.
+        Call it from the main thread once loading is done."""
+        keep = [('fighter', self.name1), ('fighter', self.name2), ('stage', self.stage_index)]
+        self.game.memory.enforce(keep)
+        # The stage may have been reduced to a smaller format
+        self.stage = self.settings.load_stage(self.stage_index)
@@ -1,34 +1,73 @@
-import pygame, sys, random
+# Imported first so startup profiling can time the imports below
+from startup import profiler
+
+import pygame, sys
 
 from settings import Settings
 from sounds import Sounds
 from fighters import Fighter
 from menu import Menus
 from debug import PgDebug
+from memory import MemoryBudget
+from render import create_renderer
+from camera import Camera
+from effects import Effects
+from capture import Capture
+from hotreload import AssetWatcher
+from broadcast import Broadcaster
+from players import PlayerSlots, HPBars
+from pacer import FramePacer
+from results import ResultsStore, match_result
 
 """Main file to run the FiGHTPuNKS game."""
 
-class FiGHTPuNKS:
+class FiGHTPuNKS(PlayerSlots, HPBars):
     """Class to manage game assets and behaviour."""
 
-    def __init__(self):
+    def __init__(self, show_menu = True):
         """Initializes the game and creates game resources."""
-        pygame.init()
-        self.clock = pygame.time.Clock()
-        self.settings = Settings() # Calls settings.py
-        self.sounds = Sounds() # Calls sounds.py
-        self.timer_font = pygame.Font('assets/fonts/NIRVANA.TTF', 100)
+        with profiler.section('init', 'pygame.init'):
+            pygame.init()
         self.settings = Settings() # This should initialize display
+        self.pacer = FramePacer(self.settings)
+        with profiler.section('assets', 'fonts'):
+            self.timer_font = pygame.Font('assets/fonts/NIRVANA.TTF', 100)
+        self.timer_surfaces = {}
         
-        # Set up the display (after settings)
-        self.screen = pygame.display.get_surface()
-        if not self.screen:
-            self.screen = pygame.display.set_mode((self.settings.screen_width, self.settings.screen_height))
+        # Set up the display (after settings). Everything is drawn through
+        # the renderer, which stands in for the display surface.
+        with profiler.section('init', 'renderer'):
+            self.renderer = create_renderer(self.settings)
+        self.screen = self.renderer
+        self.camera = Camera(self.settings)
+        self.effects = Effects(self.settings)
+        self.capture = Capture(self.settings)
+        self.stage = None
+
+        # Player slots: fighters[i] is driven by controllers[i]
+        self.fighters = []
+        self.controllers = []
+        self.key_controllers = {} # key -> controller of the player it is bound to
+        self.tick = 0 # game updates so far, saved in match snapshots
+        self.start_time = 0 # game time the round started at
     
         self.sounds = Sounds() # Initialize sounds after display
+        self.memory = MemoryBudget(self) # Tracks memory used by assets
+        # Reloads changed assets while developing
+        self.watcher = AssetWatcher(self) if self.settings.hot_reload else None
+        # Saves every match for the scoreboard
+        self.results = None
+        if self.settings.results_path:
+            with profiler.section('init', 'results store'):
+                self.results = ResultsStore(self.settings.results_path,
+                                            self.settings.results_batch_size)
+        # Publishes matches to spectators
+        self.broadcaster = None
+        if self.settings.spectator_port is not None:
+            self.broadcaster = Broadcaster(self, port=self.settings.spectator_port)
         
         # For debugging
-        self.debug = PgDebug()
+        self.debug = PgDebug(self.renderer)
         self.debug.debugging = True
 
         # Set the background color of the screen
@@ -36,33 +75,42 @@ class FiGHTPuNKS:
         
         # Start Menu
         self.menus = Menus(self)
-        self.menus.start_menu()
+        if show_menu:
+            self.menus.start_menu()
 
         # Initializes joystick support
         #pygame.joystick.init() 
         #self.joystick = []
 
+    def set_stage(self, stage):
+        """Sets the stage of the next match, the camera sizes the world to it."""
+        self.stage = stage
+        self.camera.set_stage(stage)
+
+    def stage_index(self):
+        """Returns the index of the match stage in Settings.stages, 0 if it isn't one of them."""
+        for index, stage in enumerate(self.settings.stages):
+            if stage is self.stage:
+                return index
+        return 0
+
     def load_fighters(self, name1, name2, invert):
-        self.fighter = Fighter(self, (self.screen.width / 5) * 1, 650,
-                               name1, True, ) # Calls Kevin in fighter.py
-        self.dummy = Fighter(self, (self.screen.width / 5) * 4, 650,
-                             name2, False, is_inverted=invert) # Calls Test Dummy
-        
-    def show_hp(self, fighter, pos, is_player_1):
-        surf = pygame.Surface((fighter.hp * 5, 50))
-        if is_player_1:
-            surf_rect = surf.get_frect(topleft = pos)
-        else:
-            surf_rect = surf.get_frect(topright = pos)
-            
-        surf.fill('red')
-        self.screen.blit(surf, surf_rect)
-        
+        """Sets up a match between the two keyboard players"""
+        self.clear_players()
+        self.add_player(name1, self.settings.p1_controls) # Calls Kevin in fighter.py
+        self.add_player(name2, self.settings.p2_controls, inverted=invert) # Calls Test Dummy
+        self.place_fighters()
+
+    def time_left(self):
+        """Returns the seconds left in the round."""
+        return int((self.time - (self.get_ticks() - self.start_time)) / 1000)
+
     def timer(self, pos):
-        current_time = pygame.time.get_ticks()
-        timer = (self.time - (current_time - self.start_time)) / 1000
-        timer = int(timer)
-        surf = self.timer_font.render(str(timer), True, 'silver')
+        timer = self.time_left()
+        # Each number is rendered once, so the texture backend uploads it once
+        if timer not in self.timer_surfaces:
+            self.timer_surfaces[timer] = self.timer_font.render(str(timer), True, 'silver')
+        surf = self.timer_surfaces[timer]
         rect = surf.get_frect(center = pos)
         
         self.screen.blit(surf, rect)
@@ -70,25 +118,70 @@ class FiGHTPuNKS:
         if timer <= 0:
             self.running = False
         
-    def run_game(self):
+    def run_game(self, stage = None):
         """Start the main loop for the game"""
-        # Stop menu music and start stage music
-        self.sounds.stop_music()
-        
-        self.stage = self.settings.stages[random.randint(1, len(self.settings.stages) - 1)]
+        # Use the stage set for this match (MatchLoader's, through set_stage),
+        # or pick one now and place the fighters on it
+        if stage is None and self.stage is None:
+            stage = self.settings.load_stage(self.settings.pick_stage())
+        if stage is not None:
+            self.set_stage(stage)
+            self.place_fighters()
         self.running = True
         
-        # Load stage music - only play ONE random stage music
-        stage_keys = list(self.sounds.stage_music.keys())
-        random_stage = stage_keys[random.randint(0, len(stage_keys) - 1)]
-        self.sounds.play_stage_music(random_stage)
+        # Start the round timer
+        self.time = self.settings.round_time
+        self.start_time = self.get_ticks()
+        
+        # Crossfade from the menu music to the stage music picked (and
+        # already decoded) by MatchLoader
+        self.sounds.play_stage_music(self.sounds.next_stage)
+        self.memory.update()
+        self.effects.clear()
+        if self.settings.capture_format:
+            self.capture.start(self.settings.capture_format)
+        if self.broadcaster:
+            self.broadcaster.start_match(self.fighters, self.stage_index())
         
+        # The game updates at a fixed tick rate whatever the frame rate,
+        # frames drawn between two ticks are interpolated
+        step = 1 / self.settings.tick_rate
+        lag = step # update once before the first frame
+        self.pacer.reset()
         while self.running:
             self.check_events()
-            self.fighter.update()
-            self.dummy.update()
-            self.update_screen()
-            self.clock.tick(60)
+            if self.watcher:
+                self.watcher.poll()
+            while lag >= step and self.running:
+                self.update_fighters()
+                if self.round_over():
+                    self.running = False
+                if self.broadcaster:
+                    self.broadcaster.publish(self.time_left())
+                lag -= step
+            self.update_screen(lag / step)
+            frame_time = self.pacer.tick()
+            # A paced frame a hair off the tick rate counts as one tick, so
+            # the drift doesn't make an odd frame update twice or not at all
+            if abs(frame_time - step) < 0.0005:
+                frame_time = step
+            # Long stalls (the pause menu, a slow frame) don't have to be caught up
+            lag += min(frame_time, 5 * step)
+        self.capture.stop()
+        if self.results:
+            self.results.record(match_result(self.fighters, self.stage_index(),
+                                             self.get_ticks() - self.start_time))
+        # The next match picks its own stage
+        self.stage = None
+
+    def update_fighters(self):
+        """Runs one tick of every player slot and the effects"""
+        super().update_fighters()
+        self.effects.update()
+
+    def hit_landed(self, attacker, target, damage):
+        """Sparks where a hit lands"""
+        self.effects.hit(attacker.hit_point, damage)
 
     def check_events(self):
         """Responds to keyboard, mouse, and joystick events"""
@@ -116,147 +209,56 @@ class FiGHTPuNKS:
             
     def check_keydown_events(self, event):
         """Responds to keys being pressed"""
-        # Player 1 Movement
-        if event.key == pygame.K_d:
-            self.fighter.moving_right = True
-            # Dash controls
-            current_time = pygame.time.get_ticks()
-            if current_time - self.fighter.last_press_time <= self.fighter.double_press_window:
-                if not self.fighter.is_dashing:
-                    self.fighter.dash_right = True
-                    self.fighter.is_dashing = True
-                    self.fighter.dash_start_time = current_time
-                self.fighter.last_press_time = 0
-                
-            self.fighter.last_press_time = current_time
-
-        elif event.key == pygame.K_a:
-            self.fighter.moving_left = True
-            # Dash controls
-            current_time = pygame.time.get_ticks()
-            if current_time - self.fighter.last_press_time <= self.fighter.double_press_window:
-                if not self.fighter.is_dashing:
-                    self.fighter.dash_left = True
-                    self.fighter.is_dashing = True
-                    self.fighter.dash_start_time = current_time
-                self.fighter.last_press_time = 0
-                    
-            self.fighter.last_press_time = current_time
-
-        elif event.key == pygame.K_w: # Jump control
-            self.fighter.jumping = True
-
-        # Player 1 attack
-        elif event.key == pygame.K_x:
-            if not self.fighter.is_attacking_1:
-                self.fighter.attack_1 = True
-                self.fighter.is_attacking_1 = True
-                self.fighter.attack_1_start_time = pygame.time.get_ticks()
-
-        elif event.key == pygame.K_c:
-            if not self.fighter.is_attacking_2:
-                self.fighter.attack_2 = True
-                self.fighter.is_attacking_2 = True
-                self.fighter.attack_2_start_time = pygame.time.get_ticks()
-                
-        elif event.key == pygame.K_m:
-            if not self.dummy.is_attacking_1:
-                self.dummy.attack_1 = True
-                self.dummy.is_attacking_1 = True
-                self.dummy.attack_1_start_time = pygame.time.get_ticks()
-
-        elif event.key == pygame.K_n:
-            if not self.dummy.is_attacking_2:
-                self.dummy.attack_2 = True
-                self.dummy.is_attacking_2 = True
-                self.dummy.attack_2_start_time = pygame.time.get_ticks()
-                
-        # Player 2 Movement
-        elif event.key == pygame.K_l:
-            self.dummy.moving_right = True
-            # Dash controls
-            current_time = pygame.time.get_ticks()
-            if current_time - self.dummy.last_press_time <= self.dummy.double_press_window:
-                if not self.dummy.is_dashing:
-                    self.dummy.dash_right = True
-                    self.dummy.is_dashing = True
-                    self.dummy.dash_start_time = current_time
-                self.dummy.last_press_time = 0
-                
-            self.dummy.last_press_time = current_time
-        elif event.key == pygame.K_j:
-            self.dummy.moving_left = True
-            # Dash controls
-            current_time = pygame.time.get_ticks()
-            if current_time - self.dummy.last_press_time <= self.dummy.double_press_window:
-                if not self.dummy.is_dashing:
-                    self.dummy.dash_left = True
-                    self.dummy.is_dashing = True
-                    self.dummy.dash_start_time = current_time
-                self.dummy.last_press_time = 0
-                    
-            self.dummy.last_press_time = current_time
-            
-        elif event.key == pygame.K_i: # Jump control
-            self.dummy.jumping = True
-            
-        elif event.key == pygame.K_m:
-            if not self.dummy.is_attacking_1:
-                self.dummy.attack_1 = True
-                self.dummy.is_attacking_1 = True
-                self.dummy.attack_1_start_time = pygame.time.get_ticks()
-
-        elif event.key == pygame.K_n:
-            if not self.dummy.is_attacking_2:
-                self.dummy.attack_2 = True
-                self.dummy.is_attacking_2 = True
-                self.dummy.attack_2_start_time = pygame.time.get_ticks()
+        # Player controls
+        if event.key in self.key_controllers:
+            self.key_controllers[event.key].key_down(event.key)
+        # Screenshots and clips
+        elif event.key == self.settings.screenshot_key:
+            self.capture.screenshot()
+        elif event.key == self.settings.record_key:
+            self.capture.toggle()
         # Escape to close
         elif event.key == pygame.K_ESCAPE:
             self.menus.pause_menu()
+            # Time spent paused isn't played
+            self.pacer.reset()
     
     def check_keyup_events(self,event):
         """Responds to keys being released"""
-        # Player 1 movement
-        if event.key == pygame.K_d:
-            self.fighter.moving_right = False
-        elif event.key == pygame.K_a:
-            self.fighter.moving_left = False
-        # Player 1 attack
-        elif event.key == pygame.K_x:
-            self.fighter.attack_1 = False
-        elif event.key == pygame.K_c:
-            self.fighter.attack_2 = False
-
-        # Player 2 movement
-        elif event.key == pygame.K_l:
-            self.dummy.moving_right = False
-        elif event.key == pygame.K_j:
-            self.dummy.moving_left = False
-        elif event.key == pygame.K_m:
-            self.dummy.attack_1 = False
-        elif event.key == pygame.K_n:
-            self.dummy.attack_2 = False
+        if event.key in self.key_controllers:
+            self.key_controllers[event.key].key_up(event.key)
 
-    def update_screen(self):
-        """Updates images on the screen and flip to new screen"""
-        # Sets the background to default stage.
-        self.screen.blit(self.stage, (0,0))
-        self.settings.bg_image = pygame.transform.scale(self.settings.bg_image,
-                                                        (self.settings.screen_width, 
-                                                         self.settings.screen_height))
-        # Draws the fighter on the screen
-        self.fighter.draw(self.screen)
-        self.dummy.draw(self.screen)
+    def update_screen(self, alpha = 1.0):
+        """Updates images on the screen and flip to new screen. alpha is how
+        far the frame is between the last tick and the next one."""
+        # The camera eases by the time since the last frame
+        self.camera.follow(*self.fighters, steps=self.pacer.last_frame * self.settings.tick_rate)
+        # Draws the part of the stage the camera sees
+        self.camera.draw_layer(self.renderer, self.stage)
+        # Draws the fighters on the screen
+        for fighter in self.fighters:
+            fighter.draw(self.renderer, self.camera, alpha)
+        # Frames running over budget skip what can be left out
+        if self.pacer.load_level < 2:
+            self.effects.draw(self.renderer, self.camera)
         
-        self.show_hp(self.fighter, (50,50), True)
-        self.show_hp(self.dummy, (self.screen.width - 50,50), False)
+        self.show_hps()
         
         self.timer((self.screen.width/2, 75))
+        
+        if self.pacer.load_level < 1:
+            self.debug.debug(self.pacer.overlay_text(), self.screen.height - 90)
+            self.debug.debug(self.memory.overlay_text(), self.screen.height - 30)
+        if self.capture.recording or self.capture.error:
+            self.debug.debug(self.capture.overlay_text(), self.screen.height - 60)
 
         # self.screen.blit(self.fighter.idle[self.fighter.current_index], self.fighter.rect)
         
-        pygame.display.flip()
+        # Capture the finished frame. This comes before flip because the
+        # texture backend's back buffer is undefined after it is presented.
+        self.capture.grab(self.renderer)
+        self.pacer.frame_ready()
+        self.renderer.flip()
 
 if __name__ == '__main__':
     # Make game instance and run the game
@@ -0,0 +1,116 @@
+import pygame
+
+"""Handles memory accounting for the game assets.
+This module contains the MemoryBudget class, which reports how many bytes the
+fighter frames, stages and decoded music take, and frees the least recently
+used ones when the budget set in Settings.memory_budget is exceeded."""
+
+def surface_bytes(surface):
+    """Returns the bytes used by a surface's pixels."""
+    return surface.get_pitch() * surface.get_height()
+
+def sound_bytes(sound):
+    """Returns the bytes used by a decoded sound."""
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+def format_bytes(size):
+    """Formats a byte count as megabytes."""
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+class MemoryBudget:
+    """Class to report and limit the memory used by assets."""
+
+    def __init__(self, game_instance):
+        """Initializes the memory budget."""
+        self.game = game_instance
+        self.settings = self.game.settings
+        self.sounds = self.game.sounds
+        self.total = 0
+        self.update()
+
+    def report(self):
+        """Returns the bytes used per fighter and action, per stage and per cache."""
+        fighters = {}
+        for name, animations in self.settings.fighters.items():
+            fighters[name] = {action: sum(surface_bytes(frame) for frame in frames)
+                              for action, frames in animations.items()}
+
+        variants = {}
+        for (name, flipped, inverted), animations in self.settings.fighter_variants.items():
+            key = name + (' flipped' if flipped else '') + (' inverted' if inverted else '')
+            variants[key] = sum(surface_bytes(frame) for frames in animations.values()
+                                for frame in frames)
+
+        stages = {}
+        for path, stage in zip(self.settings.stage_paths, self.settings.stages):
+            if stage is not None:
+                stages[path] = surface_bytes(stage)
+
+        music = {path: sound_bytes(sound) for path, sound in list(self.sounds.music.tracks.items())}
+
+        total = (sum(sum(actions.values()) for actions in fighters.values())
+                 + sum(variants.values()) + sum(stages.values()) + sum(music.values()))
+        return {
+            'fighters': fighters,
+            'variants': variants,
+            'stages': stages,
+            'music': music,
+            'total': total,
+            'budget': self.settings.memory_budget,
+            'reduced': self.settings.reduced_surfaces,
+        }
+
+    def update(self):
+        """Recounts the total, returns it."""
+        self.total = self.report()['total']
+        return self.total
+
+    def over_budget(self):
+        """Checks if the assets use more memory than the budget allows."""
+        budget = self.settings.memory_budget
+        self.update()
+        return budget is not None and self.total > budget
+
+    def enforce(self, keep = ()):
+        """Frees assets until the budget is met. keep lists the ('fighter', name)
+        and ('stage', index) keys in use, those are never freed. Only call it
+        from the main thread, the menus and the game use the assets it frees."""
+        if not self.over_budget():
+            return
+
+        # First free the least recently used fighters and stages
+        for key in list(self.settings.last_used):
+            if key in keep:
+                continue
+            kind, value = key
+            if kind == 'fighter':
+                self.settings.unload_fighter(value)
+            else:
+                self.settings.unload_stage(value)
+            if not self.over_budget():
+                return
+
+        # Then the decoded track, unless it is the next stage's
+        next_music = self.sounds.stage_music.get(self.sounds.next_stage)
+        self.sounds.music.unload_unused([next_music])
+        if not self.over_budget():
+            return
+
+        # Finally fall back to smaller surfaces
+        if not self.settings.reduced_surfaces:
+            self.settings.reduce_surfaces()
+            self.update()
+        if self.over_budget():
+            print(f"Memory budget exceeded: {format_bytes(self.total)} used, "
+                  f"{format_bytes(self.settings.memory_budget)} allowed")
+
+    def overlay_text(self):
+        """Returns the memory usage line shown by the debug overlay."""
+        text = f'MEM {format_bytes(self.total)}'
+        if self.settings.memory_budget is not None:
+            text += f' / {format_bytes(self.settings.memory_budget)}'
+        if self.settings.reduced_surfaces:
+            text += ' (reduced)'
+        return text
@@ -1,6 +1,10 @@
 import pygame, sys
 from button import Button
 from fighters import Fighter
+from loader import MatchLoader
+from startup import profiler
+from pacer import FramePacer
+from scoreboard import Scoreboard
 
 """Handles displaying the ui.
 This module contains the Menu class, which is responsible for displaying
@@ -13,13 +17,39 @@ class Menus:
         # pygame.init()
         # pygame.display.set_mode((1200, 700))
         self.game = game_instance
-        self.screen = pygame.display.get_surface()
+        self.screen = self.game.renderer
         self.screen_rect = self.screen.get_frect()
-        self.font = pygame.Font('assets/fonts/NIRVANA.TTF', 60)
-        self.clock = pygame.Clock()
+        with profiler.section('assets', 'fonts'):
+            self.font = pygame.Font('assets/fonts/NIRVANA.TTF', 60)
         
-        self.logo = pygame.image.load('assets/images/menu/logo.png').convert_alpha()
+        with profiler.section('assets', 'menu'):
+            self.logo = pygame.image.load('assets/images/menu/logo.png').convert_alpha()
         
+        # Menus sleep until there is input and only redraw when something
+        # changed. Animated menus wake up every animation_timeout.
+        self.idle_timeout = 1000 # milliseconds
+        self.animation_timeout = 50 # milliseconds
+        self.fps = 60 # most redraws per second
+        self.pacer = FramePacer(self.game.settings, self.fps, busy_wait=False)
+        
+    # Events that mean the window has to be drawn again
+    REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED,
+                     pygame.WINDOWSIZECHANGED)
+
+    def wait_events(self, timeout):
+        """Sleeps until there are events or timeout milliseconds pass, returns the events."""
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def hover_changed(self, buttons):
+        """Updates the buttons' hover colors, returns True if any changed."""
+        changed = False
+        for button in buttons:
+            if button.change_color():
+                changed = True
+        return changed
 
     def start_menu(self):
         """Display and handle the start menu."""
@@ -28,20 +58,22 @@ class Menus:
         
         # Buttons
         START = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 25), 'START', self.font, 'black', 'red')
-        SETTINGS = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 100), 'SETTINGS', self.font, 'black', 'red')
-        CREDITS = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 175), 'CREDITS', self.font, 'black', 'red')
-        QUIT = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 250), 'QUIT', self.font, 'black', 'red')
+        SETTINGS = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 90), 'SETTINGS', self.font, 'black', 'red')
+        SCORES = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 155), 'SCORES', self.font, 'black', 'red')
+        CREDITS = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 220), 'CREDITS', self.font, 'black', 'red')
+        QUIT = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 285), 'QUIT', self.font, 'black', 'red')
         
-        bg_image = pygame.image.load('assets/images/menu/start_menu.2.png').convert()
-        bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
-        logo = pygame.transform.rotozoom(self.logo, 0, .8)
+        with profiler.section('assets', 'menu'):
+            bg_image = pygame.image.load('assets/images/menu/start_menu.2.png').convert()
+            bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
+            logo = pygame.transform.rotozoom(self.logo, 0, .8)
         logo_rect = logo.get_frect(center = (self.screen_rect.centerx, self.screen_rect.centery - 175))
+        buttons = [START, SETTINGS, SCORES, CREDITS, QUIT]
         running = True
+        redraw = True
         
         while running:
-            self.clock.tick(60)
-            
-            for event in pygame.event.get():
+            for event in self.wait_events(self.idle_timeout):
                 if event.type == pygame.QUIT:
                     sys.exit()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -49,21 +81,63 @@ class Menus:
                         self.character_select_menu()
                     elif SETTINGS.is_clicked():
                         self.settings_menu()
+                    elif SCORES.is_clicked():
+                        self.scores_menu()
                     elif CREDITS.is_clicked():
                         self.credits_menu()
                     elif QUIT.is_clicked():
                         sys.exit()
+                    # Other menus may have drawn over this one
+                    redraw = True
+                elif event.type in self.REDRAW_EVENTS:
+                    redraw = True
             
-            self.screen.blit(bg_image, (0,0))
-            self.screen.blit(logo, logo_rect)
-            for button in [START, SETTINGS, CREDITS, QUIT]:
-                button.update(self.screen)
-            
-            pygame.display.flip()
+            if self.hover_changed(buttons) or redraw:
+                self.screen.blit(bg_image, (0,0))
+                self.screen.blit(logo, logo_rect)
+                for button in buttons:
+                    button.draw(self.screen)
+                
+                self.screen.flip()
+                profiler.first_frame()
+                redraw = False
+                self.pacer.tick()
     
     def settings_menu(self):
         pass
     
+    def scores_menu(self):
+        """Display the leaderboard until EXIT is clicked."""
+        EXIT = Button(None, (self.screen_rect.centerx, self.screen_rect.bottom - 75), 'EXIT', self.font, 'black', 'red')
+        # Finish saving the last match so it is on the board
+        if self.game.results:
+            self.game.results.flush()
+        scoreboard = Scoreboard(self.game)
+
+        bg_image = pygame.image.load('assets/images/menu/start_menu.png').convert()
+        bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
+        running = True
+        redraw = True
+
+        while running:
+            for event in self.wait_events(self.idle_timeout):
+                if event.type == pygame.QUIT:
+                    sys.exit()
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if EXIT.is_clicked():
+                        running = False
+                elif event.type in self.REDRAW_EVENTS:
+                    redraw = True
+
+            if running and (self.hover_changed([EXIT]) or redraw):
+                self.screen.blit(bg_image, (0,0))
+                scoreboard.show_scores()
+                EXIT.draw(self.screen)
+
+                self.screen.flip()
+                redraw = False
+                self.pacer.tick()
+
     def credits_menu(self):
         # Buttons
         EXIT = Button(None, (self.screen_rect.centerx, self.screen_rect.centery), 'EXIT', self.font, 'black', 'red')
@@ -71,25 +145,30 @@ class Menus:
         bg_image = pygame.image.load('assets/images/menu/start_menu.png').convert()
         bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
         running = True
+        redraw = True
 
         while running:
-            self.clock.tick(60)
-            
-            for event in pygame.event.get():
+            for event in self.wait_events(self.idle_timeout):
                 if event.type == pygame.QUIT:
                     sys.exit()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if EXIT.is_clicked():
                         self.start_menu()
+                elif event.type in self.REDRAW_EVENTS:
+                    redraw = True
             
-            self.screen.blit(bg_image, (0,0))
-            for button in [EXIT]:
-                button.update(self.screen)
-            
-            pygame.display.flip()
+            if self.hover_changed([EXIT]) or redraw:
+                self.screen.blit(bg_image, (0,0))
+                for button in [EXIT]:
+                    button.draw(self.screen)
+                
+                self.screen.flip()
+                redraw = False
+                self.pacer.tick()
     
     def character_select_menu(self):
         self._load_fighters()
+        loader = None
         
         # Buttons
         PLAY = Button(None, (self.screen_rect.centerx, self.screen_rect.centery + 300), 'PLAY', self.font, 'white', 'red')
@@ -98,17 +177,19 @@ class Menus:
         bg_image = pygame.image.load('assets/images/menu/character_select_no_char.png').convert()
         bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
         selected1 = selected2 = ''
+        fighters1 = [self.fighter1, self.fighter2, self.fighter3]
+        fighters2 = [self.fighter4, self.fighter5, self.fighter6]
+        hovered = None
+        last_animation = pygame.time.get_ticks()
         running = True
+        redraw = True
         
         while running:
-            # For debugging
-            print(selected1, selected2)
-            self.game.debug.debug(str(pygame.mouse.get_pos()))
-            
+            # The idle animations keep running, so wake up regularly
+            events = self.wait_events(self.animation_timeout)
             mouse_pos = pygame.mouse.get_pos()
-            self.clock.tick(60)
             
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     sys.exit()
                 elif event.type == pygame.KEYDOWN:
@@ -116,35 +197,106 @@ class Menus:
                         running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     # Determine which fighter is selected
-                    for fighter in [self.fighter1, self.fighter2, self.fighter3]:
+                    for fighter in fighters1:
                         clicked = fighter.on_click(mouse_pos)
                         selected1 =  clicked if clicked else selected1
-                    for fighter in [self.fighter4, self.fighter5, self.fighter6]:
+                    for fighter in fighters2:
                         clicked = fighter.on_click(mouse_pos)
                         selected2 =  clicked if clicked else selected2
                     
-                    if PLAY.is_clicked():
+                    # Start loading the match as soon as both fighters are picked
+                    if selected1 and selected2:
+                        if loader is None or not loader.matches(selected1, selected2):
+                            if loader:
+                                loader.cancel()
+                            loader = MatchLoader(self.game, selected1, selected2)
+                    
+                    if PLAY.is_clicked() and loader:
                         try:
-                            duplicate = selected1 == selected2
-                            self.game.load_fighters(selected1, selected2, duplicate)
-                            self.game.run_game()
-                        except:
-                            pass
-              
-            self.screen.blit(bg_image, (0,0))
-
-            # update and draw buttons
-            for button in [PLAY]:
-                button.update(self.screen)
+                            self.loading_screen(loader)
+                            if loader.error is None:
+                                duplicate = selected1 == selected2
+                                self.game.set_stage(loader.stage)
+                                self.game.load_fighters(selected1, selected2, duplicate)
+                                self.game.run_game()
+                        except (pygame.error, OSError) as e:
+                            # A broken asset ends the match, not the game
+                            print(f"Error playing match: {e}")
+                        # The next match picks and loads its own stage and music
+                        loader = None
+                    redraw = True
+                elif event.type in self.REDRAW_EVENTS:
+                    redraw = True
+                elif event.type == pygame.MOUSEMOTION and self.game.debug.debugging:
+                    # The debug overlay shows the mouse position
+                    redraw = True
             
-            # animate and draw fighters
-            for fighter in [self.fighter1, self.fighter2, self.fighter3]:
-                fighter.menu_update(mouse_pos, 0.5, selected1)
-            for fighter in [self.fighter4, self.fighter5, self.fighter6]:
-                fighter.menu_update(mouse_pos, 0.5, selected2)
+            # Advance the animations by the time that passed, the speed is
+            # the same as at 60 FPS whatever the loop rate
+            now = pygame.time.get_ticks()
+            speed_scale = 0.5 * (now - last_animation) / (1000 / 60)
+            last_animation = now
+            for fighter in fighters1 + fighters2:
+                if fighter.menu_animate(speed_scale):
+                    redraw = True
+            
+            # Hovered fighters are drawn bigger
+            now_hovered = [fighter.rect.collidepoint(mouse_pos) for fighter in fighters1 + fighters2]
+            if now_hovered != hovered:
+                hovered = now_hovered
+                redraw = True
+            
+            if self.hover_changed([PLAY]) or redraw:
+                self.screen.blit(bg_image, (0,0))
+
+                # draw buttons
+                for button in [PLAY]:
+                    button.draw(self.screen)
+                
+                # draw fighters
+                for fighter in fighters1:
+                    fighter.menu_draw(mouse_pos, selected1)
+                for fighter in fighters2:
+                    fighter.menu_draw(mouse_pos, selected2)
+                
+                # For debugging
+                self.game.debug.debug(str(mouse_pos))
+                self.game.debug.debug(self.game.memory.overlay_text(), self.screen.height - 30)
 
-            pygame.display.flip()
+                self.screen.flip()
+                redraw = False
+                self.pacer.tick()
     
+    def loading_screen(self, loader):
+        """Display the loading progress until the match is loaded."""
+        bg_image = pygame.image.load('assets/images/menu/Matrix_Main_bg.png').convert()
+        bg_image = pygame.transform.scale(bg_image, (self.screen.width, self.screen.height))
+        bar_rect = pygame.FRect(0, 0, 600, 30)
+        bar_rect.center = (self.screen_rect.centerx, self.screen_rect.centery + 100)
+        
+        while not loader.done.is_set():
+            self.pacer.tick()
+            
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    sys.exit()
+            
+            self.screen.blit(bg_image, (0,0))
+            
+            text = self.font.render(loader.status, True, 'white')
+            self.screen.blit(text, text.get_frect(center = self.screen_rect.center))
+            
+            fill_rect = bar_rect.copy()
+            fill_rect.width = bar_rect.width * loader.progress
+            self.screen.draw_rect('red', fill_rect)
+            self.screen.draw_rect('white', bar_rect, 2)
+            
+            self.screen.flip()
+        
+        print(f"Match loaded in {loader.load_time * 1000:.0f} ms")
+        if loader.error is None:
+            loader.free_memory()
+
     def _load_fighters(self):
         """Loads the fighters for character select"""
         self.fighter1 = Fighter(self.game, 130, 400, 'Xiuhcoatl', True, 1)
@@ -166,12 +318,12 @@ class Menus:
         logo = pygame.transform.rotozoom(self.logo, 0, 1)
         logo_rect = logo.get_frect(center = (self.screen_rect.centerx, self.screen_rect.centery - 150))
         
+        buttons = [CONTINUE, SETTINGS, QUIT]
         running = True
+        redraw = True
 
         while running:
-            self.clock.tick(60)
-            
-            for event in pygame.event.get():
+            for event in self.wait_events(self.idle_timeout):
                 if event.type == pygame.QUIT:
                     sys.exit()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -179,15 +331,21 @@ class Menus:
                         running = False
                     elif SETTINGS.is_clicked():
                         self.settings_menu()
-                    elif QUIT:
+                    elif QUIT.is_clicked():
                         sys.exit()
+                    redraw = True
+                elif event.type in self.REDRAW_EVENTS:
+                    redraw = True
             
-            self.screen.blit(bg_image, (0,0))
-            self.screen.blit(logo, logo_rect)
-            for button in [CONTINUE, SETTINGS, QUIT]:
-                button.update(self.screen)
-            
-            pygame.display.flip()
+            if running and (self.hover_changed(buttons) or redraw):
+                self.screen.blit(bg_image, (0,0))
+                self.screen.blit(logo, logo_rect)
+                for button in buttons:
+                    button.draw(self.screen)
+                
+                self.screen.flip()
+                redraw = False
+                self.pacer.tick()
     
     def post_game_menu(self):
         pass
@@ -0,0 +1,184 @@
+import pygame, threading, time
+
+"""Handles background music playback.
+This module contains the MusicManager class. The playing track is streamed
+from its file with pygame.mixer.music, so it never sits decoded in memory.
+Only the next track, usually the next stage's, is decoded ahead of time on a
+worker thread: it fades in on a reserved channel while the stream fades out,
+then the stream takes over from the same position and the decoded copy is
+dropped. A track that wasn't decoded ahead is streamed right away. Switching
+music never blocks the game loop."""
+
+class MusicManager:
+    """Class to prepare, play and crossfade background music."""
+
+    def __init__(self, volume = 0.5, fade_ms = 1000):
+        """Initializes the music channel. The mixer must already be initialized."""
+        self.volume = volume
+        self.fade_ms = fade_ms
+
+        # Reserved so sound effects never steal it, plays the decoded track
+        # while it fades in
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.current = None # path of the track playing
+
+        self.tracks = {} # path -> decoded Sound, at most one: the next track
+        self.loading = {} # path -> Event set when decoding ends
+        self.lock = threading.Lock()
+        # Held by the workers while they switch the stream, which opens the
+        # file, so the game thread never waits for that under self.lock
+        self.stream_lock = threading.Lock()
+        self.request_id = 0
+
+        # How long each transition took, most recent last
+        self.transitions = []
+
+    def prepare(self, path):
+        """Starts decoding the next track on a worker thread, if it isn't ready
+        yet. It replaces the track decoded before."""
+        with self.lock:
+            if path in self.tracks or path in self.loading or path == self.current:
+                return
+            self.loading[path] = threading.Event()
+        threading.Thread(target=self._load, args=(path,), daemon=True).start()
+
+    def _load(self, path):
+        """Decodes a track. Runs on a worker thread."""
+        try:
+            sound = pygame.mixer.Sound(path)
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Error loading music '{path}': {e}")
+            sound = None
+
+        with self.lock:
+            if sound:
+                # Only one decoded track is kept
+                self.tracks = {path: sound}
+            done = self.loading.pop(path)
+        done.set()
+
+    def unload_unused(self, keep = ()):
+        """Frees the decoded track unless it is in keep."""
+        with self.lock:
+            for path in list(self.tracks):
+                if path not in keep:
+                    del self.tracks[path]
+
+    def reload(self, path):
+        """Decodes a changed track again if it is decoded, or restarts it if it
+        is streaming. Returns True if the track was in use."""
+        with self.lock:
+            current = path == self.current
+            request_id = self.request_id
+            decoded = self.tracks.pop(path, None) is not None
+        if current:
+            self._stream(path, request_id)
+            return True
+        if not decoded:
+            return False
+        self.prepare(path)
+        return True
+
+    def wait(self, path, timeout = None):
+        """Blocks until a prepared track is decoded. Returns True if it is ready."""
+        with self.lock:
+            done = self.loading.get(path)
+        if done:
+            done.wait(timeout)
+        with self.lock:
+            return path in self.tracks
+
+    def play(self, path):
+        """Crossfades to a track, a prepared one as soon as it is decoded.
+        Returns immediately."""
+        requested = time.perf_counter()
+        with self.lock:
+            if path == self.current:
+                return
+            self.request_id += 1
+            request_id = self.request_id
+        threading.Thread(target=self._transition, args=(path, request_id, requested),
+                         daemon=True).start()
+
+    def _transition(self, path, request_id, requested):
+        """Fades to the track, then streams it. Runs on a worker thread."""
+        with self.lock:
+            done = self.loading.get(path)
+        if done:
+            done.wait()
+        ready = time.perf_counter()
+
+        with self.lock:
+            # A newer request replaced this one while the track was decoding
+            if request_id != self.request_id:
+                return
+            # The decoded track only lives until the stream takes over
+            sound = self.tracks.pop(path, None)
+            self.current = path
+            if sound:
+                pygame.mixer.music.fadeout(self.fade_ms)
+                self.channel.set_volume(self.volume)
+                self.channel.play(sound, loops=-1, fade_ms=self.fade_ms)
+            else:
+                self.channel.fadeout(self.fade_ms)
+            started = time.perf_counter()
+
+            self.transitions.append({
+                'track': path,
+                'prepare_ms': (ready - requested) * 1000,
+                'total_ms': (started - requested) * 1000,
+            })
+        print(f"Playing music: {path} (ready after {(ready - requested) * 1000:.0f} ms)")
+
+        if sound:
+            # The stream can only be switched once the old track has faded
+            # out, then it carries on from where the decoded track got to
+            time.sleep(self.fade_ms / 1000)
+            self._stream(path, request_id, started, sound.get_length())
+        else:
+            # Nothing decoded to crossfade with, the stream replaces the old
+            # track right away
+            self._stream(path, request_id)
+
+    def _stream(self, path, request_id, started = None, length = None):
+        """Streams path, from the position a decoded copy started at started
+        has got to, or fading in from the start. Does nothing if a newer
+        request came in. Runs on a worker thread."""
+        with self.stream_lock:
+            with self.lock:
+                if request_id != self.request_id:
+                    return
+            pygame.mixer.music.load(path)
+            with self.lock:
+                if request_id != self.request_id:
+                    return
+                pygame.mixer.music.set_volume(self.volume)
+                if started is None:
+                    pygame.mixer.music.play(loops=-1, fade_ms=self.fade_ms)
+                else:
+                    position = (time.perf_counter() - started) % length
+                    pygame.mixer.music.play(loops=-1, start=position)
+                    self.channel.stop()
+
+    def stop(self):
+        """Stops the music right away."""
+        with self.lock:
+            self.request_id += 1
+            self.current = None
+            pygame.mixer.music.stop()
+            self.channel.stop()
+
+    def fadeout(self, fade_ms):
+        """Fades the music out over fade_ms milliseconds."""
+        with self.lock:
+            self.request_id += 1
+            self.current = None
+            pygame.mixer.music.fadeout(fade_ms)
+            self.channel.fadeout(fade_ms)
+
+    def set_volume(self, volume):
+        """Changes the music volume."""
+        self.volume = volume
+        pygame.mixer.music.set_volume(volume)
+        self.channel.set_volume(volume)
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+
+"""Handles frame pacing.
+This module contains the FramePacer class, which replaces Clock.tick in the
+match loop. It sleeps until shortly before the next frame is due and busy
+waits the rest, since OS sleeps can overshoot by a millisecond or more. It
+keeps the recent frame times for the debug overlay and the benchmarks, and
+raises a load level when frames take longer than their budget, so the game
+can skip optional drawing until it catches up."""
+
+class FramePacer:
+    """Class to pace frames to a target rate and measure them."""
+
+    def __init__(self, settings, target_fps = None, busy_wait = True, history = 240):
+        """Paces to settings.target_fps unless target_fps is given, 0 is
+        uncapped. With vsync the flip paces the frames and the pacer only
+        measures them. Menus, which don't need precise frames, pass
+        busy_wait=False."""
+        self.target_fps = settings.target_fps if target_fps is None else target_fps
+        self.busy_wait = settings.pacer_busy_wait_ms / 1000 if busy_wait else 0
+        self.vsync = settings.vsync
+        self.frame_times = deque(maxlen=history) # seconds between frames
+        self.work_times = deque(maxlen=history) # seconds spent before waiting
+        self.load_level = 0 # 0 normal, 1 skip the debug overlay, 2 skip effects too
+        self.late_frames = 0
+        self.last_frame = 1 / settings.tick_rate # seconds, until the first tick
+        self.reset()
+
+    @property
+    def period(self):
+        return 1 / self.target_fps if self.target_fps else 0
+
+    def reset(self):
+        """Starts pacing from now, e.g. after a pause."""
+        self.last = time.perf_counter()
+        self.deadline = self.last + self.period
+        self.work_end = None
+
+    def frame_ready(self):
+        """Marks the frame as drawn, call it just before the flip. Time spent
+        in the flip, which waits for vsync, then doesn't count as work."""
+        self.work_end = time.perf_counter()
+
+    def tick(self):
+        """Waits until the next frame is due. Returns the seconds since the last tick."""
+        now = time.perf_counter()
+        work = (self.work_end or now) - self.last
+        self.work_end = None
+        period = self.period
+
+        if period and not self.vsync:
+            remaining = self.deadline - now
+            if remaining > self.busy_wait:
+                time.sleep(remaining - self.busy_wait)
+            while time.perf_counter() < self.deadline:
+                pass
+            now = time.perf_counter()
+            if now - self.deadline > period:
+                # More than a frame behind, don't rush to catch up
+                self.deadline = now + period
+            else:
+                self.deadline += period
+
+        frame_time = now - self.last
+        self.last = now
+        self.last_frame = frame_time
+        self.frame_times.append(frame_time)
+        self.work_times.append(work)
+        if period and frame_time > period * 1.5:
+            self.late_frames += 1
+        self.adapt(work)
+        return frame_time
+
+    def adapt(self, work):
+        """Raises the load level when frames run over budget, lowers it once
+        they are comfortably back under."""
+        budget = self.period or 1 / 60
+        recent = self.work_times
+        if len(recent) < 10:
+            return
+        # Average over the last few frames so one slow frame doesn't switch
+        average = sum(recent[i] for i in range(len(recent) - 10, len(recent))) / 10
+        if average > budget and self.load_level < 2:
+            self.load_level += 1
+            recent.clear()
+        elif average > budget * 0.85 and self.load_level < 1:
+            self.load_level = 1
+            recent.clear()
+        elif average < budget * 0.6 and self.load_level > 0:
+            self.load_level -= 1
+            recent.clear()
+
+    def stats(self):
+        """Returns the frame rate and the mean, deviation and 99th percentile
+        of the frame times, in ms."""
+        times = sorted(self.frame_times)
+        if not times:
+            return {'fps': 0.0, 'mean_ms': 0.0, 'stdev_ms': 0.0, 'p99_ms': 0.0,
+                    'late_frames': self.late_frames, 'load_level': self.load_level}
+        mean = sum(times) / len(times)
+        variance = sum((t - mean) ** 2 for t in times) / len(times)
+        return {
+            'fps': 1 / mean if mean else 0.0,
+            'mean_ms': mean * 1000,
+            'stdev_ms': variance ** 0.5 * 1000,
+            'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+            'late_frames': self.late_frames,
+            'load_level': self.load_level,
+        }
+
+    def overlay_text(self):
+        """Returns the frame pacing line shown by the debug overlay."""
+        stats = self.stats()
+        target = self.target_fps or 'uncapped'
+        return (f"FPS {stats['fps']:.1f} / {target}  {stats['mean_ms']:.2f} "
+                f"+-{stats['stdev_ms']:.2f} ms  p99 {stats['p99_ms']:.2f}")
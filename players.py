@@ -0,0 +1,147 @@
+import pygame
+
+from fighters import Fighter
+from ai import CPUController
+
+"""Handles the players' controls.
+This module contains the KeyboardController class, which drives a Fighter
+from a key -> action map such as Settings.p1_controls. It has the same
+update/key_down/key_up interface as CPUController, so the game handles
+every player slot the same way whoever controls it.
+
+It also contains PlayerSlots, the match logic FiGHTPuNKS and the headless
+tournament.HeadlessMatch share: adding and placing the players, running a
+tick of them, applying hits and telling when the round is over, and HPBars,
+the HP bar layout the game and the spectator client share."""
+
+class KeyboardController:
+    """Class to control a fighter with the keyboard."""
+
+    def __init__(self, fighter, controls):
+        """Initializes the controller for fighter with a key -> action map."""
+        self.fighter = fighter
+        self.controls = controls
+
+    def key_down(self, key):
+        """Starts the action bound to key. Returns True if the key is bound."""
+        action = self.controls.get(key)
+        if action is None:
+            return False
+        self.fighter.start_action(action)
+        return True
+
+    def key_up(self, key):
+        """Stops the action bound to key. Returns True if the key is bound."""
+        action = self.controls.get(key)
+        if action is None:
+            return False
+        self.fighter.stop_action(action)
+        return True
+
+    def update(self):
+        """Keys are handled as their events arrive, nothing to do per tick."""
+
+
+class PlayerSlots:
+    """Base class for anything that plays a match. Subclasses need settings,
+    camera, renderer and tick, which the fighters use."""
+
+    def get_ticks(self):
+        """Returns the game time in milliseconds, fighters time their actions with it.
+        It's counted in ticks, so it stops while paused and replays exactly."""
+        return int(self.tick * 1000 / self.settings.tick_rate)
+
+    def clear_players(self):
+        """Removes every player slot"""
+        self.fighters = []
+        self.controllers = []
+        self.key_controllers = {}
+
+    def add_player(self, name, controls = None, team = None, inverted = False, seed = None):
+        """Adds a player slot. controls is a key -> action map, None for a CPU
+        player. Players on the same team can't hit each other, by default
+        everyone is on their own team. Call place_fighters once all are added."""
+        index = len(self.fighters)
+        # Every other fighter faces left
+        fighter = Fighter(self, 0, 650, name, index % 2 == 0, is_inverted=inverted)
+        fighter.team = index if team is None else team
+        if controls is None:
+            controller = CPUController(fighter, None, seed=seed, opponents=[])
+        else:
+            controller = KeyboardController(fighter, controls)
+            for key in controls:
+                self.key_controllers[key] = controller
+        self.fighters.append(fighter)
+        self.controllers.append(controller)
+
+        # CPU players fight everyone not on their team
+        for controller in self.controllers:
+            if isinstance(controller, CPUController):
+                controller.opponents = [other for other in self.fighters
+                                        if other.team != controller.fighter.team]
+        return fighter
+
+    def place_fighters(self):
+        """Spreads the fighters around the middle of the stage, set the stage first"""
+        width = self.settings.screen_width
+        x = self.camera.world.centerx - width / 2
+        count = len(self.fighters)
+        for index, fighter in enumerate(self.fighters):
+            # Two fighters start 1/5 of the screen from each side
+            offset = 0.5 if count == 1 else 1 / 5 + 3 / 5 * index / (count - 1)
+            fighter.rect.midbottom = (x + width * offset, 650)
+            fighter.previous_pos = fighter.rect.topleft
+
+    def update_fighters(self):
+        """Runs one tick of every player slot"""
+        for controller in self.controllers:
+            controller.update()
+        for fighter in self.fighters:
+            fighter.update()
+        self.check_hits()
+        self.tick += 1
+
+    def check_hits(self):
+        """Applies every landed attack"""
+        for attacker in self.fighters:
+            # Only fighters with an attack out can hit anything
+            if not (attacker.is_attacking_1 or attacker.is_attacking_2):
+                continue
+            for target in self.fighters:
+                if target.team == attacker.team or target.hp <= 0:
+                    continue
+                damage = attacker.check_hit(target)
+                if damage:
+                    self.hit_landed(attacker, target, damage)
+
+    def hit_landed(self, attacker, target, damage):
+        """Called for every hit check_hits applies, nothing to do by default."""
+
+    def round_over(self):
+        """Checks if at most one team has fighters standing"""
+        teams = {fighter.team for fighter in self.fighters if fighter.hp > 0}
+        return len(teams) <= 1
+
+
+class HPBars:
+    """Base class for anything that draws the players' HP bars. Subclasses
+    need fighters, screen and renderer."""
+
+    def show_hps(self):
+        """Draws the HP bars, facing right fighters on the left and the others on the right"""
+        left = [fighter for fighter in self.fighters if fighter.is_player_1]
+        right = [fighter for fighter in self.fighters if not fighter.is_player_1]
+        for fighters, x, is_player_1 in ((left, 50, True), (right, self.screen.width - 50, False)):
+            # More fighters share the same space
+            height = max(6, 50 // max(len(fighters), 1))
+            for index, fighter in enumerate(fighters):
+                self.show_hp(fighter, (x, 50 + index * height), is_player_1, height)
+
+    def show_hp(self, fighter, pos, is_player_1, height = 50):
+        """Draws one HP bar from pos, growing right for player 1 and left otherwise"""
+        hp_rect = pygame.FRect(0, 0, fighter.hp * 5, height)
+        if is_player_1:
+            hp_rect.topleft = pos
+        else:
+            hp_rect.topright = pos
+        self.renderer.draw_rect('red', hp_rect)
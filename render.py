@@ -0,0 +1,140 @@
+import pygame, weakref
+
+"""Handles drawing to the window.
+This module contains the two render backends. SurfaceRenderer blits onto the
+display surface in software, like pygame.display does. TextureRenderer uses
+pygame._sdl2's Renderer: every surface is uploaded to a texture once and
+mirrored with the texture flip flag when drawn.
+
+Both take the same calls (blit, draw_rect, flip) and can stand in for the
+display surface in blit calls, so the game and menus draw through either."""
+
+class SurfaceRenderer:
+    """Class to draw with software blits onto the display surface."""
+
+    name = 'surface'
+    can_flip = False # mirrored frames must be prepared up front
+
+    def __init__(self):
+        """Uses the display surface set by Settings."""
+        self.surface = pygame.display.get_surface()
+        self.width, self.height = self.surface.get_size()
+
+    def get_rect(self, **kwargs):
+        return self.surface.get_rect(**kwargs)
+
+    def get_frect(self, **kwargs):
+        return self.surface.get_frect(**kwargs)
+
+    def blit(self, source, dest, flip_x = False, area = None):
+        """Draws source with its top left corner at dest. area limits the
+        part of source drawn."""
+        if flip_x:
+            source = pygame.transform.flip(source, True, False)
+        self.surface.blit(source, dest, area)
+
+    def blits(self, sequence):
+        """Draws a batch of (source, dest) pairs."""
+        self.surface.fblits(sequence)
+
+    def read_pixels(self, surface):
+        """Copies the current frame into surface."""
+        surface.blit(self.surface, (0, 0))
+
+    def draw_rect(self, color, rect, width = 0):
+        """Draws a filled rectangle, or its outline if width is given."""
+        pygame.draw.rect(self.surface, color, rect, width)
+
+    def flip(self):
+        """Shows the frame."""
+        pygame.display.flip()
+
+
+class TextureRenderer:
+    """Class to draw with SDL textures."""
+
+    name = 'texture'
+    can_flip = True # frames are mirrored by the renderer
+
+    def __init__(self, size, title, software = False, vsync = False):
+        """Opens the window the renderer draws to. software forces SDL's
+        software renderer, so it also works without a GPU."""
+        from pygame._sdl2.video import Window, Renderer, Texture
+
+        self.texture_class = Texture
+        self.window = Window(title, size)
+        self.renderer = Renderer(self.window, accelerated=0 if software else -1, vsync=vsync)
+        self.width, self.height = size
+
+        # Each surface is uploaded once, its texture goes away with it
+        self.textures = weakref.WeakKeyDictionary()
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect(0, 0, self.width, self.height)
+        return rect.move_to(**kwargs) if kwargs else rect
+
+    def get_frect(self, **kwargs):
+        rect = pygame.FRect(0, 0, self.width, self.height)
+        return rect.move_to(**kwargs) if kwargs else rect
+
+    def texture(self, surface):
+        """Returns the texture of a surface, uploading it the first time."""
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.texture_class.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        return texture
+
+    def blit(self, source, dest, flip_x = False, area = None):
+        """Draws source with its top left corner at dest. area limits the
+        part of source drawn."""
+        if area is None:
+            width, height = source.get_size()
+        else:
+            width, height = area[2], area[3]
+        self.texture(source).draw(srcrect=area, dstrect=(dest[0], dest[1], width, height),
+                                  flip_x=flip_x)
+
+    def blits(self, sequence):
+        """Draws a batch of (source, dest) pairs."""
+        texture = self.texture
+        for source, dest in sequence:
+            width, height = source.get_size()
+            texture(source).draw(dstrect=(dest[0], dest[1], width, height))
+
+    def draw_rect(self, color, rect, width = 0):
+        """Draws a filled rectangle, or its outline if width is given."""
+        self.renderer.draw_color = pygame.Color(color)
+        if width:
+            rect = pygame.FRect(rect)
+            # The renderer draws 1 pixel outlines, stack them for wider ones
+            for i in range(width):
+                self.renderer.draw_rect(rect.inflate(-2 * i, -2 * i))
+        else:
+            self.renderer.fill_rect(rect)
+
+    def read_pixels(self, surface):
+        """Copies the current frame into surface, must be called before flip."""
+        self.renderer.to_surface(surface)
+
+    def flip(self):
+        """Shows the frame and clears the next one."""
+        self.renderer.present()
+        self.renderer.draw_color = pygame.Color('black')
+        self.renderer.clear()
+
+
+def create_renderer(settings):
+    """Creates the backend chosen in Settings.render_backend, falling back to
+    SurfaceRenderer if the texture backend can't be used."""
+    if settings.render_backend in ('texture', 'texture-software'):
+        try:
+            return TextureRenderer((settings.screen_width, settings.screen_height), "FiGHTPuNKS",
+                                   software=settings.render_backend == 'texture-software',
+                                   vsync=settings.vsync)
+        # pygame._sdl2 raises its own RuntimeError subclass
+        except (ImportError, pygame.error, RuntimeError) as e:
+            print(f"Texture renderer unavailable, using surfaces: {e}")
+            # Settings hid the display window for the texture backend, show it again
+            pygame.display.set_mode((settings.screen_width, settings.screen_height))
+    return SurfaceRenderer()
@@ -0,0 +1,279 @@
+import atexit, os, queue, sqlite3, threading, time
+
+"""Handles the match results store.
+This module contains the ResultsStore class, which keeps every match played
+in an SQLite database. Each match has a row in matches and a row per fighter
+in match_fighters, with the HP it ended with and its GameStats counters.
+
+The game thread only queues results. A writer thread saves them in batches,
+one transaction per batch, and adds each batch to fighter_totals and
+matchup_totals as it goes, so the scoreboard reads a few summed rows instead
+of scanning every match. The database is in WAL mode, so the scoreboard can
+read while the writer writes."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    stage INTEGER,
+    duration_ms INTEGER NOT NULL,
+    winner_team INTEGER, -- NULL for a draw
+    source TEXT NOT NULL -- 'game' or 'tournament'
+);
+CREATE INDEX IF NOT EXISTS matches_played_at ON matches (played_at);
+
+CREATE TABLE IF NOT EXISTS match_fighters (
+    match_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    fighter TEXT NOT NULL,
+    team INTEGER NOT NULL,
+    hp REAL NOT NULL,
+    result INTEGER NOT NULL, -- 1 won, 0 draw, -1 lost
+    score REAL NOT NULL,
+    attacks INTEGER NOT NULL,
+    dashes INTEGER NOT NULL,
+    jumps INTEGER NOT NULL,
+    blocks INTEGER NOT NULL,
+    combo INTEGER NOT NULL,
+    PRIMARY KEY (match_id, slot)
+) WITHOUT ROWID;
+-- A fighter's matches, newest last. Matchups join it to the other slots.
+CREATE INDEX IF NOT EXISTS match_fighters_fighter ON match_fighters (fighter, match_id);
+
+CREATE TABLE IF NOT EXISTS fighter_totals (
+    fighter TEXT PRIMARY KEY,
+    matches INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    hp REAL NOT NULL,
+    score REAL NOT NULL,
+    attacks INTEGER NOT NULL,
+    dashes INTEGER NOT NULL,
+    jumps INTEGER NOT NULL,
+    blocks INTEGER NOT NULL,
+    best_combo INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fighter_totals_wins ON fighter_totals (wins);
+
+CREATE TABLE IF NOT EXISTS matchup_totals (
+    fighter TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    matches INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    PRIMARY KEY (fighter, opponent)
+) WITHOUT ROWID;
+"""
+
+# GameStats counters saved per fighter, match_fighters column -> attribute
+STAT_COLUMNS = (('score', 'score'), ('attacks', 'attack_count'), ('dashes', 'dash_count'),
+                ('jumps', 'jump_count'), ('blocks', 'block_count'), ('combo', 'combo_count'))
+
+FIGHTER_TOTALS_UPSERT = """
+INSERT INTO fighter_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (fighter) DO UPDATE SET
+    matches = matches + excluded.matches, wins = wins + excluded.wins,
+    losses = losses + excluded.losses, draws = draws + excluded.draws,
+    hp = hp + excluded.hp, score = score + excluded.score,
+    attacks = attacks + excluded.attacks, dashes = dashes + excluded.dashes,
+    jumps = jumps + excluded.jumps, blocks = blocks + excluded.blocks,
+    best_combo = max(best_combo, excluded.best_combo),
+    duration_ms = duration_ms + excluded.duration_ms
+"""
+
+MATCHUP_TOTALS_UPSERT = """
+INSERT INTO matchup_totals VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (fighter, opponent) DO UPDATE SET
+    matches = matches + excluded.matches, wins = wins + excluded.wins,
+    losses = losses + excluded.losses, draws = draws + excluded.draws
+"""
+
+
+def match_result(fighters, stage, duration_ms, source = 'game'):
+    """Builds the result ResultsStore.record takes from the fighters at the end of
+    a match."""
+    return {
+        'played_at': time.time(),
+        'stage': stage,
+        'duration_ms': int(duration_ms),
+        'source': source,
+        'fighters': [{'name': fighter.name, 'team': fighter.team, 'hp': fighter.hp,
+                      'stats': fighter.stats.counters()} for fighter in fighters],
+    }
+
+
+def winner_team(fighters):
+    """Returns the team with the most HP left, None if it's a draw."""
+    hp = {}
+    for fighter in fighters:
+        hp[fighter['team']] = hp.get(fighter['team'], 0) + max(fighter['hp'], 0)
+    best = max(hp.values())
+    teams = [team for team, team_hp in hp.items() if team_hp == best]
+    return teams[0] if len(teams) == 1 else None
+
+
+class ResultsStore:
+    """Class to save match results and read the scoreboard."""
+
+    def __init__(self, path, batch_size = 256):
+        """Opens (or creates) the database and starts the writer."""
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.batch_size = batch_size # results saved per transaction at most
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+
+        # Reads happen on the thread that created the store
+        self.connection = self.connect()
+        self.connection.executescript(SCHEMA)
+
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+        # Results still queued when the game quits are saved first
+        atexit.register(self.close)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode = WAL')
+        # In WAL mode this only risks the last transactions on a power cut
+        connection.execute('PRAGMA synchronous = NORMAL')
+        return connection
+
+    def record(self, result):
+        """Queues a match result, see match_result. Doesn't wait for the write."""
+        self.queue.put(result)
+
+    def record_many(self, results):
+        """Queues many results at once, e.g. a tournament's."""
+        for result in results:
+            self.queue.put(result)
+
+    def flush(self):
+        """Waits until everything queued so far is saved."""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Saves what is queued and stops the writer."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        atexit.unregister(self.close)
+
+    def _write(self):
+        """Saves queued results in batches. Runs on the writer thread."""
+        connection = self.connect()
+        running = True
+        while running:
+            # Wait for a result, then take whatever else is already queued
+            batch, waiting = [], []
+            item = self.queue.get()
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiting.append(item)
+                else:
+                    batch.append(item)
+                if not running or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                with connection:
+                    self._save(connection, batch)
+                self.written += len(batch)
+            for done in waiting:
+                done.set()
+        connection.close()
+
+    def _save(self, connection, batch):
+        """Inserts a batch and adds it to the totals, in one transaction."""
+        fighter_totals = {}
+        matchup_totals = {}
+        rows = []
+        for result in batch:
+            fighters = result['fighters']
+            winner = winner_team(fighters)
+            cursor = connection.execute(
+                'INSERT INTO matches (played_at, stage, duration_ms, winner_team, source) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (result.get('played_at', time.time()), result.get('stage'),
+                 result['duration_ms'], winner, result.get('source', 'game')))
+            match_id = cursor.lastrowid
+
+            outcomes = [0 if winner is None else 1 if fighter['team'] == winner else -1
+                        for fighter in fighters]
+            for slot, (fighter, outcome) in enumerate(zip(fighters, outcomes)):
+                stats = fighter.get('stats', {})
+                counters = [stats.get(attribute, 0) for _, attribute in STAT_COLUMNS]
+                rows.append((match_id, slot, fighter['name'], fighter['team'], fighter['hp'],
+                             outcome, *counters))
+
+                totals = fighter_totals.setdefault(fighter['name'], [0] * 12)
+                totals[0] += 1
+                totals[1 if outcome == 1 else 2 if outcome == -1 else 3] += 1
+                totals[4] += fighter['hp']
+                for index, counter in enumerate(counters[:5]):
+                    totals[5 + index] += counter
+                totals[10] = max(totals[10], counters[5])
+                totals[11] += result['duration_ms']
+
+                # Once against each fighter on another team
+                for other in fighters:
+                    if other['team'] == fighter['team']:
+                        continue
+                    totals = matchup_totals.setdefault((fighter['name'], other['name']), [0] * 4)
+                    totals[0] += 1
+                    totals[1 if outcome == 1 else 2 if outcome == -1 else 3] += 1
+
+        connection.executemany('INSERT INTO match_fighters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               rows)
+        connection.executemany(FIGHTER_TOTALS_UPSERT,
+                               [(name, *totals) for name, totals in fighter_totals.items()])
+        connection.executemany(MATCHUP_TOTALS_UPSERT,
+                               [(*names, *totals) for names, totals in matchup_totals.items()])
+
+    def leaderboard(self, limit = 10):
+        """Returns the fighters with the most wins, as (fighter, matches, wins,
+        losses, draws, best_combo) rows."""
+        return self.connection.execute(
+            'SELECT fighter, matches, wins, losses, draws, best_combo FROM fighter_totals '
+            'ORDER BY wins DESC LIMIT ?', (limit,)).fetchall()
+
+    def fighter(self, name):
+        """Returns a fighter's totals as a dict, None if it never played."""
+        cursor = self.connection.execute('SELECT * FROM fighter_totals WHERE fighter = ?', (name,))
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def matchup(self, fighter, opponent):
+        """Returns (matches, wins, losses, draws) of fighter against opponent."""
+        row = self.connection.execute(
+            'SELECT matches, wins, losses, draws FROM matchup_totals '
+            'WHERE fighter = ? AND opponent = ?', (fighter, opponent)).fetchone()
+        return row or (0, 0, 0, 0)
+
+    def history(self, fighter, opponent = None, limit = 10):
+        """Returns a fighter's latest matches, only those against opponent if
+        given, as (match_id, played_at, stage, duration_ms, hp, result) rows."""
+        if opponent is None:
+            query = ('SELECT m.id, m.played_at, m.stage, m.duration_ms, f.hp, f.result '
+                     'FROM match_fighters f JOIN matches m ON m.id = f.match_id '
+                     'WHERE f.fighter = ? ORDER BY f.match_id DESC LIMIT ?')
+            parameters = (fighter, limit)
+        else:
+            query = ('SELECT DISTINCT m.id, m.played_at, m.stage, m.duration_ms, f.hp, f.result '
+                     'FROM match_fighters f '
+                     'JOIN match_fighters o ON o.match_id = f.match_id AND o.team != f.team '
+                     'JOIN matches m ON m.id = f.match_id '
+                     'WHERE f.fighter = ? AND o.fighter = ? ORDER BY f.match_id DESC LIMIT ?')
+            parameters = (fighter, opponent, limit)
+        return self.connection.execute(query, parameters).fetchall()
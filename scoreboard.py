@@ -1,25 +1,50 @@
-import pygame.font
+import pygame
 
 """Scoreboard module.
 This module contains the Scoreboard class, which is responsible for displaying
-scoring information on the screen, such as the player's score."""
+scoring information on the screen: the leaderboard read from the results
+store's per-fighter totals."""
 
 class Scoreboard:
     """Class to report scoring information."""
-    
-    def __init__ (self, settings):
-        # not final!!!! <placeholder code block>
+
+    COLUMNS = (('FIGHTER', 0), ('PLAYED', 330), ('WON', 500), ('LOST', 640),
+               ('DRAWN', 780), ('COMBO', 930)) # header, x from the left of the table
+
+    def __init__ (self, game_instance, limit = 10):
         """Initializes scorekeeping attributes."""
-        self.settings = settings
-        self.screen = settings.screen
+        self.game = game_instance
+        self.screen = self.game.renderer
         self.screen_rect = self.screen.get_rect()
-        
+        self.limit = limit
+
         # Font settings for scoring information
-        self.text_color = (30, 30, 30)
-        self.font = pygame.font.SysFont(None, 48)
+        self.text_color = (230, 230, 230)
+        self.header_color = (230, 40, 40)
+        self.font = pygame.font.Font(None, 48)
+
+        # Prepare the initial score images
+        self.prep_scores()
 
-        # Initialize the score
-        self.score = 0
+    def prep_scores(self):
+        """Renders the leaderboard rows. Only reads the summed totals, so
+        it's as quick after thousands of matches as after one."""
+        rows = self.game.results.leaderboard(self.limit) if self.game.results else []
+        left = (self.screen_rect.width - 1050) / 2
+        self.panel = pygame.Rect(left - 20, 100, 1090, 90 + max(len(rows), 2) * 40)
+        self.images = []
+        for header, x in self.COLUMNS:
+            self.images.append((self.font.render(header, True, self.header_color), (left + x, 120)))
+        for index, (fighter, *counts) in enumerate(rows):
+            y = 170 + index * 40
+            for (_, x), value in zip(self.COLUMNS, (f'{index + 1}. {fighter}', *counts)):
+                self.images.append((self.font.render(str(value), True, self.text_color), (left + x, y)))
+        if not rows:
+            text = self.font.render('No matches played yet', True, self.text_color)
+            self.images.append((text, text.get_rect(center=(self.screen_rect.centerx, 250)).topleft))
 
-        # Prepare the initial score image
-        self.prep_score()
\ No newline at end of file
+    def show_scores(self):
+        """Draws the leaderboard."""
+        self.screen.draw_rect('black', self.panel)
+        for image, pos in self.images:
+            self.screen.blit(image, pos)
@@ -1,4 +1,6 @@
-import pygame, os, random
+import pygame, os, random, sys
+from collections import OrderedDict
+from startup import profiler
 
 """Handles game settings.
 Appropriate description will be added later."""
@@ -9,37 +11,131 @@ class Settings:
     def __init__(self):
         """Initializes game settings."""
         # Screen Settings
-        pygame.display.init()
+        with profiler.section('init', 'pygame.display.init'):
+            pygame.display.init()
         self.screen_width = 1200
         self.screen_height = 700
-        pygame.display.set_mode((self.screen_width, self.screen_height))
+
+        # Render backend: 'surface' (software blits), 'texture' (SDL
+        # renderer) or 'texture-software' (SDL renderer without a GPU).
+        # Can also be set with FIGHTPUNKS_RENDERER.
+        self.render_backend = os.environ.get('FIGHTPUNKS_RENDERER', 'surface')
+
+        # The texture backend opens its own window, the display one is only
+        # kept (hidden) so images can be converted to the display format
+        flags = pygame.HIDDEN if self.render_backend != 'surface' else 0
+
+        # Frame pacing
+        # Frames drawn per second: 60, 120, 144... or 0 for uncapped. The
+        # game itself always updates tick_rate times a second, frames in
+        # between are interpolated. Can also be set with FIGHTPUNKS_FPS.
+        self.target_fps = int(os.environ.get('FIGHTPUNKS_FPS', 60))
+        self.tick_rate = 60
+        # Lets the display's refresh pace the frames, FIGHTPUNKS_VSYNC=1
+        self.vsync = os.environ.get('FIGHTPUNKS_VSYNC') == '1'
+        self.pacer_busy_wait_ms = 2.0 # spun rather than slept before each frame
+
+        with profiler.section('init', 'pygame.display.set_mode'):
+            try:
+                pygame.display.set_mode((self.screen_width, self.screen_height), flags,
+                                        vsync=int(self.vsync))
+            except pygame.error as e:
+                print(f"Vsync unavailable: {e}")
+                self.vsync = False
+                pygame.display.set_mode((self.screen_width, self.screen_height), flags)
         pygame.display.set_caption("FiGHTPuNKS")
 
         #
         self.bg_color = (128, 128, 128)
-        self.stages = []
-        for dirpath, dirname, filenames in os.walk('assets/images/stages'):
-            for filename in filenames:
-                path = os.path.join(dirpath, filename)
-                stage = pygame.image.load(path)
-                self.stages.append(stage)
-                
-        num = random.choice(range(1,5))
-        self.bg_image = pygame.image.load(f'assets/images/stages/stage{num}.png').convert_alpha()
+        # Stages are loaded on demand by load_stage
+        path = os.path.join('assets', 'images', 'stages')
+        self.stage_paths = [os.path.join(path, filename) for filename in sorted(os.listdir(path))]
+        self.stages = [None] * len(self.stage_paths)
+        # How far the camera moves towards the fighters each frame, 1 snaps
+        self.camera_smoothing = 0.2
+
+        # Memory Settings
+        # Budget for fighter frames, stages and music in bytes, None means no
+        # limit. Can also be set in megabytes with FIGHTPUNKS_MEMORY_BUDGET_MB.
+        self.memory_budget = None
+        if os.environ.get('FIGHTPUNKS_MEMORY_BUDGET_MB'):
+            self.memory_budget = int(float(os.environ['FIGHTPUNKS_MEMORY_BUDGET_MB']) * 1024 * 1024)
+        self.reduced_surfaces = False
+        self.last_used = OrderedDict() # ('fighter', name) or ('stage', index), oldest first
 
         # Kevin's Settings
         self.fighter_speed = 15.0
-        self.fighter_vel_y = 40.0
         self.fighter_gravity = 5.0
         self.fighter_jump = 40.0
         self.fighter_dash = 50.0
 
         self.fighter_atk = 0
+        self.attack_1_damage = 5.0
+        self.attack_2_damage = 10.0
+
+        # Controls, key -> fighter action
+        self.p1_controls = {pygame.K_d: 'right', pygame.K_a: 'left', pygame.K_w: 'jump',
+                            pygame.K_x: 'attack1', pygame.K_c: 'attack2'}
+        self.p2_controls = {pygame.K_l: 'right', pygame.K_j: 'left', pygame.K_i: 'jump',
+                            pygame.K_m: 'attack1', pygame.K_n: 'attack2'}
+
+        # Hit effect Settings
+        self.effects_max_particles = 256 # sparks alive at once
+        self.effects_max_spawn = 48 # sparks spawned per frame
+        self.effects_sparks_per_damage = 2
+        self.effects_frames = 8
+        self.effects_gravity = 0.5
+
+        # Capture Settings
+        # Clips are recorded as 'png' sequences or 'raw' rgb24 video. Set
+        # FIGHTPUNKS_CAPTURE to record every match.
+        self.capture_format = os.environ.get('FIGHTPUNKS_CAPTURE')
+        self.capture_dir = 'captures'
+        self.capture_ring_size = 8 # frames waiting for the encoder
+        self.capture_png_level = 1 # zlib level, higher is smaller and slower
+        self.screenshot_key = pygame.K_F12
+        self.record_key = pygame.K_F10
+
+        # Spectator Settings
+        # Port matches are broadcast on, None to not broadcast. Can also be
+        # set with FIGHTPUNKS_SPECTATOR_PORT.
+        self.spectator_port = None
+        if os.environ.get('FIGHTPUNKS_SPECTATOR_PORT'):
+            self.spectator_port = int(os.environ['FIGHTPUNKS_SPECTATOR_PORT'])
+
+        # Results Settings
+        # Database every match is saved to, in the user's data directory,
+        # None to not save them. Can also be set with FIGHTPUNKS_RESULTS, an
+        # empty value turns it off.
+        self.results_path = os.environ.get('FIGHTPUNKS_RESULTS',
+                                           self.user_data_path('results.db')) or None
+        self.results_batch_size = 256 # results saved per transaction at most
+
+        # Development Settings
+        # Reload changed assets while the game runs, FIGHTPUNKS_HOT_RELOAD=1
+        self.hot_reload = os.environ.get('FIGHTPUNKS_HOT_RELOAD') == '1'
+        self.hot_reload_interval = 0.5 # seconds between scans of the asset tree
+
+        # Round Settings
+        self.round_time = 99000 # milliseconds
         
-        # load fighter animations
-        self.fighters = self.load_fighters()
+        # load fighter animations. Only the idle frames are needed for the
+        # menus, the rest are loaded per match by MatchLoader.
+        self.fighter_variants = {}
+        with profiler.section('assets', 'fighters'):
+            self.fighters = self.load_fighters(['idle'])
         
-    def load_fighters(self):
+    def user_data_path(self, filename):
+        """Returns the path of filename in the user's data directory for the game."""
+        if sys.platform == 'win32':
+            base = os.environ.get('APPDATA') or os.path.expanduser('~')
+        elif sys.platform == 'darwin':
+            base = os.path.expanduser('~/Library/Application Support')
+        else:
+            base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+        return os.path.join(base, 'fightpunks', filename)
+
+    def load_fighters(self, actions = None):
         path = os.path.join('assets', 'images', 'fighters')
         data = os.walk(path)
         fighter_animations = {}
@@ -51,26 +147,168 @@ class Settings:
         
         # Load fighter animations
         for fighter in fighters:
-            fighter_animations[fighter] = self.load_fighter_anim(fighter)
+            fighter_animations[fighter] = self.load_fighter_anim(fighter, actions)
         
         return fighter_animations
 
-    def load_fighter_anim(self, name):
+    def load_fighter_anim(self, name, actions = None):
         path = os.path.join('assets', 'images', 'fighters', name)
         animations = {}
         
         # Get fighter actions
-        for _, dirname, _ in os.walk(path):
-            actions = dirname
-            break
+        if actions is None:
+            for _, dirname, _ in os.walk(path):
+                actions = dirname
+                break
         
         # Load animations frames
         for action in actions:
             animations[action] = []
             for dirpath, dirname, filenames in os.walk(f"{path}/{action}"):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    frame = pygame.image.load(filepath).convert_alpha()
-                    animations[action].append(frame)
+                # Frames are numbered, keep them in order
+                for filename in sorted(filenames):
+                    animations[action].append(self.load_frame(os.path.join(dirpath, filename)))
+
+        return animations
+
+    def load_frame(self, path):
+        """Loads a fighter frame."""
+        return pygame.image.load(path).convert_alpha()
+
+    def reload_fighter_frame(self, name, action, filename):
+        """Reloads one frame of a loaded animation in place, and only that frame
+        of its variants. Returns False if the animation isn't loaded."""
+        frames = self.fighters.get(name, {}).get(action)
+        path = os.path.join('assets', 'images', 'fighters', name, action)
+        filenames = sorted(os.listdir(path))
+        if frames is None or len(filenames) != len(frames):
+            return False
+        index = filenames.index(filename)
+        frame = self.load_frame(os.path.join(path, filename))
+
+        # Fighters share these lists, so they pick the new frame up as well
+        frames[index] = frame
+        for (variant_name, flipped, inverted), variant in self.fighter_variants.items():
+            if variant_name == name:
+                variant[action][index] = self.variant_frame(frame, flipped, inverted)
+        return True
+
+    def reload_fighter_action(self, name, action):
+        """Reloads every frame of a loaded animation in place, for frames that
+        were added or removed. Returns False if the animation isn't loaded."""
+        frames = self.fighters.get(name, {}).get(action)
+        if frames is None:
+            return False
+        frames[:] = self.load_fighter_anim(name, [action])[action]
+        for (variant_name, flipped, inverted), variant in self.fighter_variants.items():
+            if variant_name == name:
+                variant[action][:] = [self.variant_frame(frame, flipped, inverted) for frame in frames]
+        return True
+
+    def load_fighter(self, name):
+        """Loads every animation of a fighter that isn't loaded yet."""
+        self.touch(('fighter', name))
+        path = os.path.join('assets', 'images', 'fighters', name)
+        loaded = self.fighters.get(name, {})
+        
+        # Get fighter actions that are still missing
+        for _, dirname, _ in os.walk(path):
+            missing = [action for action in dirname if action not in loaded]
+            break
+        if not missing:
+            return
+
+        # Build a new dict so fighters using the old one are not affected
+        animations = dict(loaded)
+        animations.update(self.load_fighter_anim(name, missing))
+        self.fighters[name] = animations
+
+        # Variants were built from the old frames, rebuild them on request
+        for key in list(self.fighter_variants):
+            if key[0] == name:
+                del self.fighter_variants[key]
+
+    def fighter_frames(self, name, flipped = False, inverted = False):
+        """Returns the animations of a fighter, mirrored and/or with inverted colors.
+        Variants are built once and shared by every Fighter using them."""
+        self.touch(('fighter', name))
+        if not flipped and not inverted:
+            return self.fighters[name]
+
+        key = (name, flipped, inverted)
+        if key not in self.fighter_variants:
+            variant = {}
+            for action, frames in self.fighters[name].items():
+                variant[action] = [self.variant_frame(frame, flipped, inverted) for frame in frames]
+            self.fighter_variants[key] = variant
+        return self.fighter_variants[key]
+
+    def variant_frame(self, frame, flipped, inverted):
+        """Returns a frame mirrored and/or with inverted colors."""
+        if flipped:
+            frame = pygame.transform.flip(frame, True, False)
+        if inverted:
+            frame = pygame.transform.invert(frame)
+        return frame
+
+
+    def load_stage(self, index):
+        """Returns a stage converted to the display format, loading it if needed."""
+        self.touch(('stage', index))
+        if self.stages[index] is None:
+            stage = pygame.image.load(self.stage_paths[index]).convert()
+            if self.reduced_surfaces:
+                stage = stage.convert(16)
+            self.stages[index] = stage
+        return self.stages[index]
+
+    def reload_stage(self, index):
+        """Loads a changed stage again if it is loaded. Returns the new stage or None.
+        If the file can't be loaded the stage loaded before is kept."""
+        old_stage = self.stages[index]
+        if old_stage is None:
+            return None
+        self.stages[index] = None
+        try:
+            return self.load_stage(index)
+        except (pygame.error, OSError):
+            self.stages[index] = old_stage
+            raise
+
+    def pick_stage(self):
+        """Returns the index of a random stage, skipping stages whose file was
+        removed and that aren't loaded anymore."""
+        indices = [index for index in range(1, len(self.stages))
+                   if self.stages[index] is not None or os.path.exists(self.stage_paths[index])]
+        return random.choice(indices)
+
+    def add_stage(self, path):
+        """Makes a new stage image available to matches."""
+        self.stage_paths.append(path)
+        self.stages.append(None)
+
+    def touch(self, key):
+        """Marks a fighter or stage as the most recently used."""
+        self.last_used[key] = None
+        self.last_used.move_to_end(key)
+
+    def unload_fighter(self, name):
+        """Frees everything but the idle frames of a fighter, the menus need those."""
+        self.fighters[name] = {'idle': self.fighters[name]['idle']}
+        for key in list(self.fighter_variants):
+            if key[0] == name:
+                del self.fighter_variants[key]
+        self.last_used.pop(('fighter', name), None)
+
+    def unload_stage(self, index):
+        """Frees a stage, it is loaded again when needed."""
+        self.stages[index] = None
+        self.last_used.pop(('stage', index), None)
 
-        return animations
\ No newline at end of file
+    def reduce_surfaces(self):
+        """Trades image quality for memory: stages drop to 16 bit. Fighter
+        frames keep their per-pixel alpha, which needs all 32 bits."""
+        self.reduced_surfaces = True
+        for index, stage in enumerate(self.stages):
+            if stage is not None and stage.get_bitsize() > 16:
+                self.stages[index] = stage.convert(16)
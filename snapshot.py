@@ -0,0 +1,145 @@
+import struct, zlib
+from operator import attrgetter
+
+from broadcast import ACTIONS, ACTION_IDS
+from ai import CPUController
+
+"""Handles match state snapshots.
+This module contains the Snapshot class, which packs everything that decides
+how a match goes on into a fixed layout: the tick and the round start time,
+and per player slot the fighter's position, jump velocity, HP, animation,
+action flags, timers, hitboxes and GameStats counters, followed by its CPU
+controller's ticks, held actions, opponent and random state.
+
+A snapshot can be restored into the same match to replay it from there, and
+the CRC32 of the packed state makes a cheap per-tick hash to compare runs.
+Match setup (fighter names, teams, the stage) and anything only drawn (hit
+sparks, the camera) are not part of it. The game clock is counted in ticks,
+so the timers replay exactly."""
+
+VERSION = 3
+HEADER = struct.Struct('<4sBBII') # magic, version, slots, tick, round start time
+# x, y, previous x, y, jump velocity, hp, score, animation index, action, the FLAGS,
+# attack 1, attack 2, dash and last press times, both hitboxes, hit point,
+# attack, dash, jump, block, combo and current combo counts, then the
+# controller's ticks, whether it holds each HELD action, opponent slot and
+# random state. Flags are a byte each, packing them as bits costs more than
+# the rest of the slot.
+SLOT = struct.Struct('<4f4dB13?4i8i2f6HI5?hQ')
+
+# Fighter flags, in the order they are packed and restore unpacks them
+FLAGS = ('moving_right', 'moving_left', 'jumping', 'dash_right', 'dash_left', 'blocking',
+         'attack_1', 'attack_2', 'is_attacking_1', 'is_attacking_2', 'attack_1_landed',
+         'attack_2_landed', 'is_dashing')
+TIMES = ('attack_1_start_time', 'attack_2_start_time', 'dash_start_time', 'last_press_time')
+COUNTERS = ('attack_count', 'dash_count', 'jump_count', 'block_count', 'combo_count',
+            'current_combo')
+# Actions a CPU controller can hold, in the order they are packed
+HELD = ('right', 'left', 'jump', 'attack1', 'attack2')
+NOT_HELD = (False,) * len(HELD)
+
+get_flags = attrgetter(*FLAGS)
+get_times = attrgetter(*TIMES)
+get_counters = attrgetter(*COUNTERS)
+
+
+class Snapshot:
+    """Class to save, restore and hash the state of a match."""
+
+    def __init__(self, game_instance):
+        """game_instance needs fighters, controllers (in the same order),
+        tick and start_time, like FiGHTPuNKS and HeadlessMatch have."""
+        self.game = game_instance
+        self.resize()
+
+    def resize(self):
+        """Lays out the buffer for the game's current player slots."""
+        self.fighters = list(self.game.fighters)
+        self.slots = len(self.fighters)
+        # Slot of each fighter, to pack the CPU controllers' opponents
+        self.slot_of = {fighter: slot for slot, fighter in enumerate(self.fighters)}
+        self.size = HEADER.size + self.slots * SLOT.size
+        self.buffer = bytearray(self.size)
+
+    def pack(self):
+        """Packs the current state into the buffer."""
+        game = self.game
+        fighters = game.fighters
+        if fighters != self.fighters:
+            self.resize()
+        buffer = self.buffer
+        HEADER.pack_into(buffer, 0, b'FPKS', VERSION, self.slots, game.tick, game.start_time)
+
+        offset = HEADER.size
+        for fighter, controller in zip(fighters, game.controllers):
+            # Keyboard controllers keep no state
+            ticks = state = 0
+            held = NOT_HELD
+            opponent = -1
+            if isinstance(controller, CPUController):
+                ticks = controller.ticks
+                held = map(controller.held.__contains__, HELD)
+                if controller.opponent is not None:
+                    opponent = self.slot_of[controller.opponent]
+                state = controller.random.state
+            SLOT.pack_into(buffer, offset, fighter.rect.x, fighter.rect.y, *fighter.previous_pos,
+                           fighter.vel_y, fighter.hp, fighter.stats.score, fighter.current_anim_index,
+                           ACTION_IDS[fighter.action], *get_flags(fighter), *get_times(fighter),
+                           *fighter.attack_1_hitbox_rect, *fighter.attack_2_hitbox_rect,
+                           *fighter.hit_point, *get_counters(fighter.stats),
+                           ticks, *held, opponent, state)
+            offset += SLOT.size
+
+    def save(self):
+        """Returns the current state as bytes."""
+        self.pack()
+        return bytes(self.buffer)
+
+    def hash(self):
+        """Returns the CRC32 of the current state."""
+        self.pack()
+        return zlib.crc32(self.buffer)
+
+    def restore(self, data):
+        """Puts the match back in a state returned by save."""
+        magic, version, slots, tick, start_time = HEADER.unpack_from(data)
+        if magic != b'FPKS' or version != VERSION:
+            raise ValueError(f'Not a version {VERSION} match snapshot')
+        game = self.game
+        fighters = game.fighters
+        if slots != len(fighters):
+            raise ValueError(f'Snapshot has {slots} slots, the match has {len(fighters)}')
+        game.tick = tick
+        game.start_time = start_time
+
+        records = SLOT.iter_unpack(memoryview(data)[HEADER.size:])
+        for values, fighter, controller in zip(records, fighters, game.controllers):
+            (x, y, previous_x, previous_y, fighter.vel_y, fighter.hp, fighter.stats.score,
+             fighter.current_anim_index, action) = values[:9]
+            fighter.rect.x, fighter.rect.y = x, y
+            fighter.previous_pos = (previous_x, previous_y)
+            (fighter.moving_right, fighter.moving_left, fighter.jumping, fighter.dash_right,
+             fighter.dash_left, fighter.blocking, fighter.attack_1, fighter.attack_2,
+             fighter.is_attacking_1, fighter.is_attacking_2, fighter.attack_1_landed,
+             fighter.attack_2_landed, fighter.is_dashing) = values[9:22]
+            (fighter.attack_1_start_time, fighter.attack_2_start_time, fighter.dash_start_time,
+             fighter.last_press_time) = values[22:26]
+            fighter.attack_1_hitbox_rect.update(values[26:30])
+            fighter.attack_2_hitbox_rect.update(values[30:34])
+            fighter.hit_point = values[34:36]
+            stats = fighter.stats
+            (stats.attack_count, stats.dash_count, stats.jump_count, stats.block_count,
+             stats.combo_count, stats.current_combo) = values[36:42]
+
+            # The frame shown follows from the action and animation index
+            fighter.action = ACTIONS[action]
+            fighter.anim = fighter.frames[fighter.action]
+            fighter.index_count = len(fighter.anim)
+            fighter.image = fighter.anim[int(fighter.current_anim_index) % fighter.index_count]
+
+            ticks, opponent, state = values[42], values[48], values[49]
+            if isinstance(controller, CPUController):
+                controller.ticks = ticks
+                controller.held = {action for action, held in zip(HELD, values[43:48]) if held}
+                controller.opponent = fighters[opponent] if opponent >= 0 else None
+                controller.random.state = state
@@ -1,6 +1,7 @@
-import pygame
+import pygame, os, random
 
-from menu import Menus
+from music import MusicManager
+from startup import profiler
 
 """Handles the in-game sounds, ost, and sfx.
 This module contains the Sounds class, which manages the background music,
@@ -11,85 +12,92 @@ class Sounds:
     
     def __init__(self):
         """Initialize the sound system."""
-        pygame.mixer.init()
-        self.menu_music = r'assets\audio\music\OST\main menu\Oddysey.mp3'
+        with profiler.section('init', 'pygame.mixer.init'):
+            pygame.mixer.init()
+        self.menu_music = os.path.join('assets', 'audio', 'music', 'OST', 'main menu', 'Oddysey.mp3')
         self.stage_music = {
-            'stage1': r'assets\audio\music\OST\stages\!!.mp3',
-            'stage2': r'assets\audio\music\OST\stages\Space Cowboys.mp3',
-            'stage3': r'assets\audio\music\OST\stages\Nano-angstrom.mp3',
-            'stage4': r'assets\audio\music\OST\stages\Enemy State.mp3',
+            'stage1': os.path.join('assets', 'audio', 'music', 'OST', 'stages', '!!.mp3'),
+            'stage2': os.path.join('assets', 'audio', 'music', 'OST', 'stages', 'Space Cowboys.mp3'),
+            'stage3': os.path.join('assets', 'audio', 'music', 'OST', 'stages', 'Nano-angstrom.mp3'),
+            'stage4': os.path.join('assets', 'audio', 'music', 'OST', 'stages', 'Enemy State.mp3'),
         }
         self.sound_effects = {
-            'combat':{'atk 1': r'assets\audio\sfx\hit.wav', 
-             'atk 2': r'assets\audio\sfx\kick.wav',
-             'ability': r'assets\audio\sfx\punch.wav',
-             'jump': r'assets\audio\sfx\jump.wav',
-             'block': r'assets\audio\sfx\block.wav',
-             'hit': r'assets\audio\sfx\hit.wav',
-             'death': r'assets\audio\sfx\death.wav'
+            'combat':{'atk 1': os.path.join('assets', 'audio', 'sfx', 'combat', 'atk_1.wav'),
+             'atk 2': os.path.join('assets', 'audio', 'sfx', 'combat', 'atk_2.wav'),
+             'ability': os.path.join('assets', 'audio', 'sfx', 'combat', 'ability.wav'),
+             'jump': os.path.join('assets', 'audio', 'sfx', 'combat', 'jump.wav'),
+             'block': os.path.join('assets', 'audio', 'sfx', 'combat', 'block.wav'),
+             'hit': os.path.join('assets', 'audio', 'sfx', 'combat', 'hit.wav'),
+             'death': os.path.join('assets', 'audio', 'sfx', 'combat', 'death.wav')
             },
-            'button': r'assets\audio\sfx\button_click.wav',
-            'victory': r'assets\audio\sfx\victory.mp3'
+            'button': os.path.join('assets', 'audio', 'sfx', 'button_click.wav'),
+            'victory': os.path.join('assets', 'audio', 'sfx', 'victory.mp3')
         }
+
+        self.effect_sounds = {} # path -> Sound, decoded on first play
+
+        # Background music is streamed, only the next stage's track is
+        # decoded ahead (off the main thread, by MatchLoader) to crossfade into
+        self.music = MusicManager(volume=0.5)
+        self.next_stage = None
         
     def play_menu_music(self):
-        """Play the main menu music."""
-        # Stop any currently playing music
-        pygame.mixer.music.stop()
-        
-        try:
-            pygame.mixer.music.load(self.menu_music)
-            pygame.mixer.music.set_volume(0.5)
-            pygame.mixer.music.play(-1)  # -1 means loop indefinitely
-            print("Menu music started playing.")
-        except pygame.error as e:
-            print(f"Error loading menu music: {e}")
+        """Crossfade to the main menu music."""
+        self.music.play(self.menu_music)
+
+    def prepare_stage_music(self, stage = None):
+        """Pick the next stage's music and start decoding it in the background."""
+        if stage is None:
+            stage = random.choice(list(self.stage_music.keys()))
+        self.next_stage = stage
+        if stage in self.stage_music:
+            self.music.prepare(self.stage_music[stage])
+        return stage
 
     def play_stage_music(self, stage):
-        """Play the stage music based on the stage name."""
-        # Stop any currently playing music
-        pygame.mixer.music.stop()
-        
-        # Map of valid stages
-        valid_stages = ['stage1', 'stage2', 'stage3', 'stage4']
-        
-        if stage in valid_stages and stage in self.stage_music:
-            try:
-                pygame.mixer.music.load(self.stage_music[stage])
-                pygame.mixer.music.set_volume(0.5)
-                pygame.mixer.music.play(-1)  # -1 means loop indefinitely
-                print(f"Playing {stage} music: {self.stage_music[stage]}")
-            except pygame.error as e:
-                print(f"Error loading stage music for '{stage}': {e}")
+        """Crossfade to the stage music based on the stage name, None streams
+        a random one when no stage music was prepared."""
+        if stage is None:
+            stage = random.choice(list(self.stage_music.keys()))
+        if stage in self.stage_music:
+            self.music.play(self.stage_music[stage])
         else:
             print(f"Stage music for '{stage}' not found or invalid stage.")
             # Fallback to stage1 music if available
             if 'stage1' in self.stage_music:
-                try:
-                    pygame.mixer.music.load(self.stage_music['stage1'])
-                    pygame.mixer.music.set_volume(0.5)
-                    pygame.mixer.music.play(-1)
-                    print("Playing fallback stage1 music.")
-                except pygame.error as e:
-                    print(f"Error loading fallback music: {e}")
+                self.music.play(self.stage_music['stage1'])
+                print("Playing fallback stage1 music.")
     
     def play_sound_effect(self, effect):
         """Play a sound effect based on the effect name."""
         if effect in self.sound_effects['combat']:
-            sound = pygame.mixer.Sound(self.sound_effects['combat'][effect])
-            sound.set_volume(0.5)
-            sound.play()
+            self.load_sound_effect(self.sound_effects['combat'][effect]).play()
         elif effect in self.sound_effects:
-            sound = pygame.mixer.Sound(self.sound_effects[effect])
-            sound.set_volume(0.5)
-            sound.play()
+            self.load_sound_effect(self.sound_effects[effect]).play()
         else:
             print(f"Sound effect '{effect}' not found.")
+
+    def load_sound_effect(self, path):
+        """Returns a sound effect, decoding it the first time it is played."""
+        sound = self.effect_sounds.get(path)
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+            sound.set_volume(0.5)
+            self.effect_sounds[path] = sound
+        return sound
+
+    def reload(self, path):
+        """Decodes a changed music track or sound effect again if it is in use."""
+        if path in self.effect_sounds:
+            del self.effect_sounds[path]
+            self.load_sound_effect(path)
+            return True
+        return self.music.reload(path)
     
     def stop_music(self):
         """Stop all music playback."""
-        pygame.mixer.music.stop()
+        self.music.stop()
 
     def fade_out_music(self, fade_time=1000):
         """Fade out the current music over specified time in milliseconds."""
-        pygame.mixer.music.fadeout(fade_time)
\ No newline at end of file
+        self.music.fadeout(fade_time)
\ No newline at end of file
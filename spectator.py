@@ -0,0 +1,159 @@
+import asyncio, sys, time
+import pygame
+
+from settings import Settings
+from fighters import Fighter
+from players import HPBars
+from camera import Camera
+from render import create_renderer
+from broadcast import ACTIONS, LENGTH, MATCH, MatchState, DEFAULT_PORT
+
+"""Spectator client for broadcast matches.
+Connects to a game broadcasting with FIGHTPUNKS_SPECTATOR_PORT and draws the
+match from its packets with the game's own assets. No game logic runs here,
+the fighters are only placed and drawn.
+
+--headless connects N clients that only decode the packets, to load test the
+host without opening windows.
+
+Usage: python spectator.py [host] [port] [--headless N] [--seconds S]"""
+
+class Spectator(HPBars):
+    """Class to draw a broadcast match."""
+
+    def __init__(self, host = 'localhost', port = DEFAULT_PORT):
+        """Opens the window and loads what the HUD needs."""
+        pygame.init()
+        self.host, self.port = host, port
+        self.settings = Settings()
+        self.renderer = create_renderer(self.settings)
+        self.screen = self.renderer
+        self.camera = Camera(self.settings)
+        self.timer_font = pygame.Font('assets/fonts/NIRVANA.TTF', 100)
+        self.timer_surfaces = {}
+
+        self.match = MatchState()
+        self.fighters = []
+        self.stage = None
+        self.running = True
+
+    def get_ticks(self):
+        return pygame.time.get_ticks()
+
+    def start_match(self):
+        """Loads the stage and fighters announced by a MATCH packet."""
+        self.stage = self.settings.load_stage(self.match.stage_index)
+        self.camera.set_stage(self.stage)
+        self.fighters = []
+        for name, is_player_1, inverted in self.match.fighters:
+            self.settings.load_fighter(name)
+            self.fighters.append(Fighter(self, 0, 650, name, is_player_1, is_inverted=inverted))
+
+    async def receive(self, reader):
+        """Applies packets until the host goes away."""
+        try:
+            while self.running:
+                length = LENGTH.unpack(await reader.readexactly(LENGTH.size))[0]
+                if self.match.apply(await reader.readexactly(length)) == MATCH:
+                    self.start_match()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            print('Host disconnected')
+        self.running = False
+
+    def draw(self):
+        """Draws the last state received."""
+        if not self.match.ready or not self.fighters:
+            self.screen.draw_rect('black', self.screen.get_rect())
+            self.renderer.flip()
+            return
+
+        for fighter, (x, y, action, frame, hp) in zip(self.fighters, self.match.states):
+            fighter.rect.topleft = (x, y)
+            frames = fighter.frames.get(ACTIONS[action]) or fighter.frames['idle']
+            fighter.image = frames[frame % len(frames)]
+            fighter.hp = hp / 10
+        self.camera.follow(*self.fighters)
+
+        self.camera.draw_layer(self.renderer, self.stage)
+        for fighter in self.fighters:
+            fighter.draw(self.renderer, self.camera)
+        self.show_hps()
+        self.show_timer()
+        self.renderer.flip()
+
+    def show_timer(self):
+        timer = self.match.timer
+        if timer not in self.timer_surfaces:
+            self.timer_surfaces[timer] = self.timer_font.render(str(timer), True, 'silver')
+        surf = self.timer_surfaces[timer]
+        self.screen.blit(surf, surf.get_frect(center=(self.screen.width / 2, 75)))
+
+    async def run(self):
+        """Draws the match at 60 FPS while packets arrive."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        receiver = asyncio.create_task(self.receive(reader))
+        while self.running:
+            started = time.perf_counter()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN
+                                                 and event.key == pygame.K_ESCAPE):
+                    self.running = False
+            self.draw()
+            # Lets the receiver run while waiting for the next frame
+            await asyncio.sleep(max(0, 1 / 60 - (time.perf_counter() - started)))
+        receiver.cancel()
+        writer.close()
+
+
+async def headless_client(host, port, seconds, totals):
+    """Connects and decodes packets without drawing. Adds its counts to totals."""
+    reader, writer = await asyncio.open_connection(host, port)
+    match = MatchState()
+    end = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < end:
+            header = await asyncio.wait_for(reader.readexactly(LENGTH.size), end - time.perf_counter())
+            packet = await reader.readexactly(LENGTH.unpack(header)[0])
+            match.apply(packet)
+            totals['packets'] += 1
+            totals['bytes'] += len(packet) + LENGTH.size
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+
+
+async def run_headless(host, port, count, seconds):
+    """Runs count headless clients at once."""
+    totals = {'packets': 0, 'bytes': 0}
+    await asyncio.gather(*(headless_client(host, port, seconds, totals) for _ in range(count)))
+    print(f"{count} clients received {totals['packets']} packets, "
+          f"{totals['bytes'] / max(totals['packets'], 1):.1f} bytes each")
+
+
+def main(argv):
+    host, port = 'localhost', DEFAULT_PORT
+    headless = None
+    seconds = 10.0
+    positional = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--headless':
+            headless = int(next(args))
+        elif arg == '--seconds':
+            seconds = float(next(args))
+        else:
+            positional.append(arg)
+    if positional:
+        host = positional[0]
+    if len(positional) > 1:
+        port = int(positional[1])
+
+    if headless:
+        asyncio.run(run_headless(host, port, headless, seconds))
+    else:
+        asyncio.run(Spectator(host, port).run())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
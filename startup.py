@@ -0,0 +1,114 @@
+import builtins, json, os, sys, time
+from contextlib import contextmanager
+
+"""Startup instrumentation.
+This module contains the StartupProfiler class, which records how long the
+game takes to get from launch to the first presented menu frame: import time
+per module, pygame subsystem init time, and load time per asset group.
+Import times are self times: a module's time doesn't include the modules it
+imports, which are reported on their own, so the times add up.
+
+Profiling is off unless FIGHTPUNKS_STARTUP_PROFILE is set. Its value is the
+path the JSON report is written to ('-' prints it instead). This module must
+be imported before pygame or any game module so it can time those imports."""
+
+class StartupProfiler:
+    """Class to collect startup timings."""
+
+    def __init__(self):
+        """Initializes the profiler from the environment."""
+        self.output = os.environ.get('FIGHTPUNKS_STARTUP_PROFILE', '')
+        self.enabled = bool(self.output)
+        self.exit_after_first_frame = bool(os.environ.get('FIGHTPUNKS_STARTUP_EXIT'))
+        self.start_time = time.perf_counter()
+        self.first_frame_time = None
+
+        # group -> {name: seconds}
+        self.timings = {'import': {}, 'init': {}, 'assets': {}}
+        self._import_children = [] # per import in progress, time spent in nested imports
+        self._original_import = None
+
+    def install_import_hook(self):
+        """Times every module that gets imported for the first time."""
+        if not self.enabled or self._original_import:
+            return
+        self._original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Only time absolute imports of modules not loaded yet
+            if level or name in sys.modules:
+                return self._original_import(name, globals, locals, fromlist, level)
+            start = time.perf_counter()
+            self._import_children.append(0.0)
+            try:
+                module = self._original_import(name, globals, locals, fromlist, level)
+            except BaseException:
+                # Failed probes (msvcrt on Linux...) aren't imports, their
+                # time stays with the module that tried them
+                self._import_children.pop()
+                raise
+            elapsed = time.perf_counter() - start
+            # Nested imports are reported on their own, not in their parent's time
+            nested = self._import_children.pop()
+            if self._import_children:
+                self._import_children[-1] += elapsed
+            imports = self.timings['import']
+            imports[name] = imports.get(name, 0.0) + elapsed - nested
+            return module
+
+        builtins.__import__ = timed_import
+
+    def remove_import_hook(self):
+        """Restores the normal import function."""
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def section(self, group, name):
+        """Times the body of a with block under group/name."""
+        if not self.enabled or self.first_frame_time is not None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[group][name] = self.timings[group].get(name, 0.0) + elapsed
+
+    def first_frame(self):
+        """Marks the first presented menu frame and writes the report."""
+        if not self.enabled or self.first_frame_time is not None:
+            return
+        self.first_frame_time = time.perf_counter()
+        self.remove_import_hook()
+        self.write_report()
+        if self.exit_after_first_frame:
+            sys.exit(0)
+
+    def report(self):
+        """Returns the collected timings in milliseconds."""
+        def to_ms(timings):
+            return {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+
+        end = self.first_frame_time or time.perf_counter()
+        return {
+            'time_to_first_frame_ms': round((end - self.start_time) * 1000, 3),
+            'import_ms': to_ms(self.timings['import']),
+            'init_ms': to_ms(self.timings['init']),
+            'assets_ms': to_ms(self.timings['assets']),
+        }
+
+    def write_report(self):
+        """Writes the report to the configured output."""
+        data = json.dumps(self.report(), indent=2)
+        if self.output == '-':
+            print(data)
+        else:
+            with open(self.output, 'w') as file:
+                file.write(data)
+
+
+profiler = StartupProfiler()
+profiler.install_import_hook()
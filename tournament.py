@@ -0,0 +1,259 @@
+import os
+
+# Matches run headless, nothing is drawn
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# Otherwise SDL catches SIGTERM and the pool can't stop its workers
+os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+
+import itertools, json, multiprocessing, sys, time
+import pygame
+
+from settings import Settings
+from players import PlayerSlots
+from render import SurfaceRenderer
+from camera import Camera
+from results import ResultsStore, match_result
+from snapshot import Snapshot
+
+"""CPU vs CPU tournament runner for balance testing.
+Plays every matchup between the fighters many times across a process pool,
+headless and without rendering, with a fixed seed per match, and reports the
+win rate and damage per matchup. --store also saves every match to a results
+database, the scoreboard's or another one.
+
+--trace saves the hash of every match's state at every tick, and --verify
+plays the matches of a trace again and reports the first tick each one
+differs at, to check a change didn't alter the game or made it
+nondeterministic.
+
+Usage: python tournament.py [--games N] [--processes N] [--seed N] [--json FILE] [--store FILE]
+                            [--trace FILE | --verify FILE]"""
+
+# Per process Settings, loaded once by init_worker
+_settings = None
+# Whether workers hash the state at every tick
+_trace = False
+
+
+class HeadlessMatch(PlayerSlots):
+    """Class to play a single match without a window or a real clock. It
+    runs the same player slots, hits and round end as the game."""
+
+    def __init__(self, settings, name1, name2, seed):
+        """Sets up both fighters and their CPU controllers."""
+        self.settings = settings
+        self.tick = 0
+        self.start_time = 0 # rounds start at tick 0
+        # Nothing is drawn, fighters only ask the renderer class whether it flips
+        self.screen = None
+        self.renderer = SurfaceRenderer
+        # Matches are played on a screen-sized stage
+        self.camera = Camera(settings)
+        self.clear_players()
+        self.fighter = self.add_player(name1, seed=seed * 2)
+        self.dummy = self.add_player(name2, inverted=name1 == name2, seed=seed * 2 + 1)
+        self.place_fighters()
+        self.max_ticks = int(settings.round_time * settings.tick_rate / 1000)
+
+    def step(self):
+        """Plays one tick. Returns False once the match is over."""
+        self.update_fighters()
+        return self.tick < self.max_ticks and not self.round_over()
+
+    def play(self, trace = None):
+        """Plays until a fighter is out or the round time runs out. Returns the
+        result. If trace is a list, the state hash of every tick is added to it."""
+        snapshot = Snapshot(self) if trace is not None else None
+        while self.step():
+            if snapshot:
+                trace.append(snapshot.hash())
+        if snapshot:
+            trace.append(snapshot.hash())
+        # Both start with 100 HP, and hits never take more than is left
+        damage = [100 - self.dummy.hp, 100 - self.fighter.hp]
+
+        if self.fighter.hp > self.dummy.hp:
+            winner = 1
+        elif self.dummy.hp > self.fighter.hp:
+            winner = 2
+        else:
+            winner = 0
+        return {'winner': winner, 'damage': damage, 'ticks': self.tick,
+                'duration_ms': self.get_ticks(), 'hp': [self.fighter.hp, self.dummy.hp],
+                'record': match_result(self.fighters, None, self.get_ticks(), 'tournament')}
+
+
+def init_worker(trace = False):
+    """Loads every fighter once per process."""
+    global _settings, _trace
+    _trace = trace
+    pygame.display.init()
+    _settings = Settings()
+    for name in list(_settings.fighters):
+        _settings.load_fighter(name)
+
+
+def play_match(task):
+    """Plays one match in a worker process."""
+    name1, name2, seed = task
+    trace = [] if _trace else None
+    result = HeadlessMatch(_settings, name1, name2, seed).play(trace)
+    result['matchup'] = (name1, name2)
+    result['seed'] = seed
+    if trace is not None:
+        result['trace'] = trace
+    return result
+
+
+def fighter_names():
+    """Returns the names of every fighter."""
+    path = os.path.join('assets', 'images', 'fighters')
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def make_tasks(names, games, seed):
+    """Builds the (name1, name2, seed) task of every match, round robin."""
+    tasks = []
+    for i, (name1, name2) in enumerate(itertools.product(names, repeat=2)):
+        for game in range(games):
+            tasks.append((name1, name2, seed + i * games + game))
+    return tasks
+
+
+def aggregate(results):
+    """Sums the match results per matchup."""
+    report = {}
+    for result in results:
+        key = '{} vs {}'.format(*result['matchup'])
+        entry = report.setdefault(key, {'games': 0, 'wins': [0, 0], 'draws': 0,
+                                        'damage': [0.0, 0.0], 'ticks': 0, 'duration_ms': 0})
+        entry['games'] += 1
+        if result['winner']:
+            entry['wins'][result['winner'] - 1] += 1
+        else:
+            entry['draws'] += 1
+        entry['damage'][0] += result['damage'][0]
+        entry['damage'][1] += result['damage'][1]
+        entry['ticks'] += result['ticks']
+        entry['duration_ms'] += result['duration_ms']
+
+    for entry in report.values():
+        games = entry['games']
+        entry['win_rate'] = [wins / games for wins in entry['wins']]
+        entry['avg_damage'] = [damage / games for damage in entry['damage']]
+        entry['avg_seconds'] = entry['duration_ms'] / 1000 / games
+    return report
+
+
+def print_report(report):
+    """Prints the win rate and damage of every matchup."""
+    print(f"{'matchup':<28} {'games':>6} {'p1 win':>7} {'p2 win':>7} {'draw':>6} "
+          f"{'p1 dmg':>7} {'p2 dmg':>7} {'secs':>6}")
+    for key, entry in sorted(report.items()):
+        print(f"{key:<28} {entry['games']:>6} {entry['win_rate'][0]:>7.1%} "
+              f"{entry['win_rate'][1]:>7.1%} {entry['draws'] / entry['games']:>6.1%} "
+              f"{entry['avg_damage'][0]:>7.1f} {entry['avg_damage'][1]:>7.1f} "
+              f"{entry['avg_seconds']:>6.1f}")
+
+
+def play_matches(games = 100, processes = None, seed = 0, names = None, trace = False):
+    """Plays the round robin across a process pool. Returns every match's result."""
+    tasks = make_tasks(names or fighter_names(), games, seed)
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(trace,)) as pool:
+        return list(pool.imap_unordered(play_match, tasks, chunksize=max(1, games // 4)))
+
+
+def run_tournament(games = 100, processes = None, seed = 0, names = None, store = None):
+    """Plays the round robin across a process pool. Returns the report.
+    Every match is also saved to store, a ResultsStore, if given."""
+    results = play_matches(games, processes, seed, names)
+    if store:
+        store.record_many(result['record'] for result in results)
+    return aggregate(results)
+
+
+def trace_key(result):
+    """Returns the key a match's hashes are saved under."""
+    return '{} vs {} #{}'.format(*result['matchup'], result['seed'])
+
+
+def save_trace(path, games, processes, seed):
+    """Plays the round robin and saves the state hashes of every match."""
+    results = play_matches(games, processes, seed, trace=True)
+    traces = {trace_key(result): result['trace'] for result in results}
+    with open(path, 'w') as file:
+        json.dump({'games': games, 'seed': seed, 'matches': traces}, file)
+    print(f'Saved the hashes of {len(traces)} matches, '
+          f'{sum(len(trace) for trace in traces.values())} ticks, to {path}')
+
+
+def verify_trace(path, processes):
+    """Plays the matches of a trace again. Returns the number that differ."""
+    with open(path) as file:
+        saved = json.load(file)
+    results = play_matches(saved['games'], processes, saved['seed'], trace=True)
+    differ = 0
+    for result in sorted(results, key=trace_key):
+        key = trace_key(result)
+        expected, trace = saved['matches'].get(key), result['trace']
+        if expected == trace:
+            continue
+        differ += 1
+        if expected is None:
+            print(f'{key}: not in the trace')
+            continue
+        tick = next((tick for tick, (a, b) in enumerate(zip(expected, trace)) if a != b),
+                    min(len(expected), len(trace)))
+        print(f'{key}: differs from tick {tick + 1}')
+    print(f'{len(results) - differ} of {len(results)} matches identical')
+    return differ
+
+
+def main(argv):
+    games = 100
+    processes = None
+    seed = 0
+    json_file = None
+    store = None
+    trace_file = verify_file = None
+    args = iter(argv)
+    for arg in args:
+        if arg == '--games':
+            games = int(next(args))
+        elif arg == '--processes':
+            processes = int(next(args))
+        elif arg == '--seed':
+            seed = int(next(args))
+        elif arg == '--json':
+            json_file = next(args)
+        elif arg == '--store':
+            store = ResultsStore(next(args))
+        elif arg == '--trace':
+            trace_file = next(args)
+        elif arg == '--verify':
+            verify_file = next(args)
+
+    if trace_file:
+        save_trace(trace_file, games, processes, seed)
+        return 0
+    if verify_file:
+        return 1 if verify_trace(verify_file, processes) else 0
+
+    start = time.perf_counter()
+    report = run_tournament(games, processes, seed, store=store)
+    print_report(report)
+    print(f'Played {sum(entry["games"] for entry in report.values())} matches '
+          f'in {time.perf_counter() - start:.1f} s')
+    if store:
+        store.close()
+        print(f'Saved {store.written} matches to {store.path}')
+
+    if json_file:
+        with open(json_file, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))